@@ -0,0 +1,81 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Copyright 2025 Andrzej Kaczmarczyk<droodev@gmail.com>
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the “Software”), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+import unittest
+import numpy as np
+import core.baseProgram as baseProgram
+from elections import ApprovalProfile
+
+
+class TestWeightedModels(unittest.TestCase):
+    """Identical ballots are merged into weighted voters; the objective values
+    of such models must not be truncated below their integral optimum. Run
+    with exp_code on PYTHONPATH"""
+
+    def setUp(self):
+        # n=8, m=7, k=2 with two ballots (three and five voters) approving
+        # candidate 5, so the smallest JR justifying group has one member; the
+        # weighted model reports this optimum slightly below 1
+        first_ballot = [0, 1, 0, 1, 1, 1, 0]
+        second_ballot = [1, 0, 1, 0, 1, 1, 1]
+        matrix = np.array(
+            [first_ballot, second_ballot, second_ballot, first_ballot]
+            + [second_ballot, first_ballot, second_ballot, second_ballot],
+            dtype=bool,
+        )
+        self._profile = ApprovalProfile(matrix)
+        self._candidates = list(range(7))
+        self._comm_size = 2
+
+    def test_minimum_jr_justifying_group(self):
+        success, core_size, coverage, _ = baseProgram.compute(
+            self._candidates,
+            self._profile,
+            0,
+            8 * 7,
+            0,
+            8,
+            self._comm_size,
+            baseProgram.CORE_MIN,
+            True,
+        )
+        self.assertTrue(success)
+        self.assertEqual(core_size, 1)
+        self.assertEqual(coverage, 8)
+
+    def test_bounded_model_minimum_jr_justifying_group(self):
+        model = baseProgram.BoundedCommitteeModel(
+            self._candidates,
+            self._profile,
+            self._comm_size,
+            baseProgram.CORE_MIN,
+            True,
+        )
+        success, core_size, coverage, _ = model.solve(0, 8 * 7, 0, 8)
+        self.assertTrue(success)
+        self.assertEqual(core_size, 1)
+        self.assertEqual(coverage, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
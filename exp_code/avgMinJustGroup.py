@@ -52,12 +52,22 @@ from distribs import (
     GaussianMixture1D,
 )
 import isxJRChecker as xJRTools
+import core.backends as backends
+import core.cfg as cfg
 import core.mylog as mylog
+import core.resources as resources
 
 logger = mylog.get_logger()
+import lccache
 import lcgroups
+import presolve
 import tools.pblib as pbtools
 
+# Up to this many ell-large ell-cohesive groups of exactly the largeness
+# threshold (see lcgroups.extract_all_lc_groups) are also turned into
+# candidate hints; their tighter approval unions prune more committees
+ALL_LC_GROUP_HINTS_LIMIT = 2000
+
 
 class Axioms(enum.Enum):
     JR = "JR"
@@ -75,6 +85,14 @@ class CsvHeaders(enum.Enum):
     MIN_EJR_JG = "Minimum EJR Just. Group"
 
 
+def generate_election(
+    distribution, voters_count, candidates_count, elections_from_file
+):
+    if elections_from_file:
+        return distribution.generate(voters_count)
+    return distribution[0].generate(range(candidates_count), voters_count)
+
+
 def experiment_trial(
     distribution,
     committee_size,
@@ -104,12 +122,9 @@ def experiment_trial(
             logger_msg += f" ({short_desc})"
             if trial_nr % report_step == 0:
                 logger.info(logger_msg)
-            if elections_from_file:
-                election = distribution.generate(voters_count)
-            else:
-                election = distribution[0].generate(
-                    range(candidates_count), voters_count
-                )
+            election = generate_election(
+                distribution, voters_count, candidates_count, elections_from_file
+            )
             jrcsizes.append(
                 compute_minimum_xjr_justifying_group(
                     election, committee_size, requested_axioms
@@ -122,6 +137,46 @@ def experiment_trial(
     return jg_sizes_per_comm_size
 
 
+def election_sweep_trial(
+    distribution,
+    committee_sizes,
+    voters_count,
+    trials,
+    requested_axioms,
+    trials_seed,
+    candidates_count,
+    elections_from_file,
+):
+    """As experiment_trial but every election is evaluated for all the
+    committee sizes; its large cohesive groups are analysed for all of them
+    in one pass (see lcgroups.large_cohesive_groups_analyses)"""
+    random.seed(trials_seed)
+    logger.info(
+        f"Started computing --> k: {list(committee_sizes)}, trials count:"
+        f" {trials}, seed: {trials_seed}"
+    )
+    jg_sizes_per_comm_size = {comm_size: [] for comm_size in committee_sizes}
+    try:
+        report_step = max(1, trials // 4)
+        for trial_nr in range(trials):
+            if trial_nr % report_step == 0:
+                logger.info(f"Election sweep, tr. {trial_nr + 1}/{trials}")
+            election = generate_election(
+                distribution, voters_count, candidates_count, elections_from_file
+            )
+            lccache.large_cohesive_groups_analyses(election, committee_sizes)
+            for comm_size in committee_sizes:
+                jg_sizes_per_comm_size[comm_size].append(
+                    compute_minimum_xjr_justifying_group(
+                        election, comm_size, requested_axioms
+                    )
+                )
+    except Exception as e:
+        logger.error(traceback.format_exc().strip())
+        raise
+    return jg_sizes_per_comm_size
+
+
 def write_to_file(outfilename, distribution, jg_sizes_per_comm_size):
     def to_int_or_None(val):
         return int(val) if (val is not None) else None
@@ -154,6 +209,7 @@ def report_failure(distribution, exception):
 
 class initializer(object):
     def __call__(self, *args, **kwargs):
+        resources.init_worker(*args)
         if sys.platform == "win32":
             import win32api  # ignoring the signal
 
@@ -219,6 +275,14 @@ def main(args):
     votersnr = args.voters_count
 
     committeesizes = range(2, 16)
+    # Each task covers either one committee size or, sweeping the elections,
+    # all of them
+    trial_function = experiment_trial
+    task_comm_sizes = committeesizes
+    if args.election_sweep:
+        trial_function = election_sweep_trial
+        task_comm_sizes = [committeesizes]
+        cfg.lc_cache_size = max(cfg.lc_cache_size, len(committeesizes))
 
     write_csv_header(outfilename)
 
@@ -240,7 +304,11 @@ def main(args):
 
         original_sigint_handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
 
-        pool = mproc.Pool(processes=poolsize, initializer=initializer())
+        pool = mproc.Pool(
+            processes=poolsize,
+            initializer=initializer(),
+            initargs=resources.budgeted_pool_args(),
+        )
 
         def terminatepool(*args, **kwargs):
             pool.terminate()
@@ -258,7 +326,7 @@ def main(args):
 
         for distro in distros:
             logger.info(f"Adding tasks for distro: {distro}")
-            for comm_size in committeesizes:
+            for comm_size in task_comm_sizes:
                 logger.info(f" Adding tasks for committee size: {comm_size}")
                 counter = 0
                 while counter < seedsperdistro:
@@ -267,7 +335,7 @@ def main(args):
                     curr_trials_batch = counter - curr_trials_batch
                     logger.info(f"  Adding tasks for trials count: {curr_trials_batch}")
                     pool.apply_async(
-                        experiment_trial,
+                        resources.Budgeted(trial_function),
                         (
                             distro,
                             comm_size,
@@ -292,9 +360,9 @@ def main(args):
 
     def notparallel_run():
         for distro in distros:
-            for comm_size in committeesizes:
+            for comm_size in task_comm_sizes:
                 try:
-                    output = experiment_trial(
+                    output = trial_function(
                         distro,
                         comm_size,
                         votersnr,
@@ -341,7 +409,15 @@ def getArgumentsParser():
         type=int,
         default=1,
         help="Maximum number of "
-        "processess used in parallelization (excluding ILP solvers)",
+        "processess used in parallelization; the ILP solver threads are shared "
+        "among the busy ones (see --solver_threads)",
+    )
+    ap.add_argument(
+        "-st",
+        "--solver_threads",
+        type=int,
+        default=cfg.solver_threads_budget,
+        help="Total number of ILP solver threads (default: all cores)",
     )
     ap.add_argument(
         "-n",
@@ -373,6 +449,30 @@ def getArgumentsParser():
     ap.add_argument(
         "-d", "--distribution", required=True, choices=__distributions_collection.keys()
     )
+    ap.add_argument(
+        "-mb",
+        "--milp_backend",
+        required=False,
+        default=cfg.milp_backend,
+        choices=backends.BACKENDS,
+        help="MILP backend solving the xJR verification models; the committee "
+        "searches always use Gurobi (see core.baseProgram)",
+    )
+    ap.add_argument(
+        "-lc",
+        "--lc_cache",
+        required=False,
+        default=cfg.lc_cache_path,
+        help="SQLite file caching the large cohesive groups analyses of "
+        "elections across runs",
+    )
+    ap.add_argument(
+        "-es",
+        "--election_sweep",
+        action="store_true",
+        help="Evaluate every generated election for all committee sizes "
+        "(instead of fresh elections for each size)",
+    )
     return ap
 
 
@@ -425,14 +525,16 @@ def write_csv_header(fileName):
 #####################################################
 
 
-def build_cand_hints(maximal_lc_groups, comm_size):
-    cand_hints = []
-    for g_size, groups in (
-        entry for entry in maximal_lc_groups.items() if entry[0] > 1
-    ):
-        for group in groups:
-            cand_hints.append((group["approved_by_all_group_members"], g_size))
-    return cand_hints
+def build_cand_hints(closed_lc_groups, comm_size):
+    """One hint per distinct ell-large ell-cohesive group with ell > 1 (see
+    lcgroups.large_cohesive_groups_analysis), taken with its largest ell: the
+    group's voters jointly approve at least ell members of any PJR/EJR
+    committee"""
+    return [
+        (group["approved_by_all_group_members"], group["ell"])
+        for group in closed_lc_groups
+        if group["ell"] > 1
+    ]
 
 
 def new_build_cand_hints(all_lc_groups, comm_size):
@@ -454,10 +556,11 @@ def compute_minimum_xjr_justifying_group(election, committee_size, requested_axi
     ejr_requested = Axioms.EJR in requested_axioms
 
     candidates = election.candidates
-    voters = election.votes
+    voters = election.profile
+    binary_profile = election.profile
 
     logger.debug(f"Starting LC group analysis")
-    lc_groups_data = lcgroups.large_cohesive_groups_analysis(election, committee_size)
+    lc_groups_data = lccache.large_cohesive_groups_analysis(election, committee_size)
     max_lc_group_size = lc_groups_data["max_ell_in_lc_groups"]
     usable_cands_per_g_size = lc_groups_data["usable_cands_per_g_size"]
     maximal_lc_groups = lc_groups_data["maximal_lc_groups"]
@@ -478,16 +581,6 @@ def compute_minimum_xjr_justifying_group(election, committee_size, requested_axi
             min_jr_just_group if ejr_requested else None,
         )
 
-        ### logger.debug(f"Extracting all LC groups")
-        ### bigger_lc_groups = lcgroups.extract_all_lc_groups(maximal_lc_groups, \
-        ###   committee_size, voters, min_ell = 2)
-        ### #one_lc_groups = lcgroups.extract_all_lc_groups(maximal_lc_groups, \
-        ### #  committee_size, voters, min_ell = 1, max_ell = 1)
-
-        ### logger.debug(f"#at-least-2 lc-groups: {len(bigger_lc_groups)}")
-    # for lc_group in bigger_lc_groups:
-    #   logger.warning(f"{lc_group}")
-
     pjr_ejr_relevant_cands = reduce(
         lambda acc, usable: acc | usable,
         [item[1] for item in usable_cands_per_g_size.items() if item[0] > 1],
@@ -515,8 +608,34 @@ def compute_minimum_xjr_justifying_group(election, committee_size, requested_axi
     # logger.warning(f"\n{rel_cand}")
 
     min_pjr_just_group = min_ejr_just_group = None
-    cand_hints = build_cand_hints(maximal_lc_groups, committee_size)
-    # cand_hints = new_build_cand_hints(bigger_lc_groups, committee_size)
+    pjr_verifier = xJRTools.XJRVerifier(
+        binary_profile,
+        committee_size,
+        xJRTools.PJR,
+        pjr_ejr_relevant_cands,
+        lc_analysis=lc_groups_data,
+    )
+    ejr_verifier = xJRTools.XJRVerifier(
+        binary_profile,
+        committee_size,
+        xJRTools.EJR,
+        pjr_ejr_relevant_cands,
+        lc_analysis=lc_groups_data,
+    )
+    cand_hints = build_cand_hints(lc_groups_data["closed_lc_groups"], committee_size)
+    bigger_lc_groups_count = lcgroups.count_all_lc_groups(
+        maximal_lc_groups,
+        committee_size,
+        len(voters),
+        min_ell=2,
+        limit=ALL_LC_GROUP_HINTS_LIMIT,
+    )
+    if bigger_lc_groups_count <= ALL_LC_GROUP_HINTS_LIMIT:
+        logger.debug(f"#at-least-2 lc-groups: {bigger_lc_groups_count}")
+        bigger_lc_groups = lcgroups.extract_all_lc_groups(
+            maximal_lc_groups, committee_size, voters, min_ell=2
+        )
+        cand_hints += new_build_cand_hints(bigger_lc_groups, committee_size)
     logger.debug(
         "Min. PJR and/or EJR just. groups have to be computed as they're not "
         "equivalent to min. JR just. groups because there are ell-large and "
@@ -534,86 +653,39 @@ def compute_minimum_xjr_justifying_group(election, committee_size, requested_axi
         counter = 0
         for group in groups:
             counter += 1
-            binary_profile = election.get_binary_representation()
             if pjr_requested and min_pjr_just_group is None:
                 min_pjr_just_group = (
-                    expected_group_size
-                    if xJRTools.isPJR_ilp(
-                        binary_profile, group, committee_size, pjr_ejr_relevant_cands
-                    )
-                    else None
+                    expected_group_size if pjr_verifier.check(group)[0] else None
                 )
             if ejr_requested and min_ejr_just_group is None:
                 min_ejr_just_group = (
-                    expected_group_size
-                    if xJRTools.isEJR_ilp(
-                        binary_profile, group, committee_size, pjr_ejr_relevant_cands
-                    )
-                    else None
+                    expected_group_size if ejr_verifier.check(group)[0] else None
                 )
             if (not ejr_requested or min_ejr_just_group is not None) and (
                 not pjr_requested or min_pjr_just_group is not None
             ):
                 logger.debug(f"Tried {counter} groups")
+                # stop the enumeration (and its model) without further pools
+                groups.close()
                 return (min_jr_just_group, min_pjr_just_group, min_ejr_just_group)
     return (min_jr_just_group, min_pjr_just_group, min_ejr_just_group)
 
 
 def remove_redundant_candidates(
-    # all_lc_groups,
     usable_cands,
     election,
     committee_size,
 ):
-    # lc_relevant_voters = reduce(lambda acc, lc_g: acc | set(list(lc_g["voters"]))
-    #                            , all_lc_groups, set())
-    lc_relevant_voters = set(range(len(election.votes)))
-    # logger.warning(f"Init voters: {len(election.votes)}; filtered voters: {len(lc_relevant_voters)}")
-    # logger.warning(f"relevant voters: {lc_relevant_voters}")
-    usable_cands = set(usable_cands)
-    cand_support_map = election.get_candidate_support_map()
-    covered_cands = set()
-    for cand_a in usable_cands:
-        for cand_b in usable_cands:
-            if cand_a >= cand_b:
-                continue
-            cand_a_sup = cand_support_map[cand_a] & lc_relevant_voters
-            cand_b_sup = cand_support_map[cand_b] & lc_relevant_voters
-            if cand_a_sup - cand_b_sup == set():
-                covered_cands.add(cand_a)
-            elif cand_b_sup - cand_a_sup == set():
-                covered_cands.add(cand_b)
-    covered_cands = sorted(
-        list(covered_cands),
-        key=lambda c: len(cand_support_map[c] & lc_relevant_voters),
-        reverse=True,
+    """Usable candidates left by the dominance presolve, see
+    presolve.undominated_candidates"""
+    return presolve.undominated_candidates(
+        election.profile, committee_size, usable_cands
     )
-    # logger.warning(f"Cov candidates: {covered_cands}")
-    new_usable_cands = set(usable_cands)
-    while covered_cands:
-        c = covered_cands.pop()
-        coverage_counter = 0
-        for other in new_usable_cands:
-            if c == other:
-                continue
-            c_sup = cand_support_map[cand_a] & lc_relevant_voters
-            other_sup = cand_support_map[cand_b] & lc_relevant_voters
-            if (c_sup - other_sup) == set():
-                coverage_counter += 1
-        if coverage_counter >= committee_size:
-            new_usable_cands.remove(c)
-    # logger.warning(f"{len(usable_cands)} --> {len(new_usable_cands)}")
-    return new_usable_cands
 
 
 def get_minimum_jr_justifying_group(candidates, voters, committee_size):
     votersCount = len(voters)
     candidatesCount = len(candidates)
-    if isinstance(voters, list):
-        voters = dict(
-            (index_voter[0], index_voter[1].approvals)
-            for index_voter in enumerate(voters)
-        )
     if isinstance(candidates, list) and isinstance(candidates[0], cands.Candidate):
         candidates = [c.ordinal_number for c in candidates]
     _, jrcSize, _, _ = baseProgram.compute(
@@ -639,7 +711,7 @@ def get_all_min_jr_just_groups(
     be selected in a final committee
     """
     candidates = election.candidates
-    voters = election.votes
+    voters = election.profile
     votersCount = len(voters)
     candidatesCount = len(candidates)
 
@@ -665,11 +737,6 @@ def get_all_min_jr_just_groups(
     #     logger.info("Am here")
     #     temp_cand_hints = [(set(group), group_size)]
     # temp_cand_hints = cand_hints
-    if isinstance(voters, list):
-        voters = dict(
-            (index_voter[0], index_voter[1].approvals)
-            for index_voter in enumerate(voters)
-        )
     if isinstance(candidates, list) and isinstance(candidates[0], cands.Candidate):
         candidates = [c.ordinal_number for c in candidates]
     generator = baseProgram.enumerate_specific_jr_groups_comp_hints(
@@ -684,4 +751,7 @@ def get_all_min_jr_just_groups(
 
 if __name__ == "__main__":
     args = getArgumentsParser().parse_args()
+    cfg.milp_backend = args.milp_backend
+    cfg.solver_threads_budget = args.solver_threads
+    cfg.lc_cache_path = args.lc_cache
     main(args)
@@ -0,0 +1,145 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Copyright 2025 Andrzej Kaczmarczyk<droodev@gmail.com>
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the “Software”), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+"""MILP backends for the PuLP models (the xJR verification ILPs). The backend
+is chosen per run via cfg.milp_backend or per model by passing its name to
+get_solver. The gurobipy models of core.baseProgram do not go through it and
+always need Gurobi"""
+
+import pulp
+
+import core.cfg as cfg
+import core.resources as resources
+
+GUROBI = "gurobi"
+HIGHS = "highs"
+CBC = "cbc"
+CPSAT = "cpsat"
+
+BACKENDS = (GUROBI, HIGHS, CBC, CPSAT)
+
+# domain used by CP-SAT for integer variables without bounds
+_CPSAT_UNBOUNDED = 2**31 - 1
+
+
+class CPSAT_SOLVER(pulp.LpSolver):
+    """PuLP interface to OR-Tools CP-SAT; the model has to be pure integer
+    with integral coefficients (as all the xJR verification ILPs are)"""
+
+    name = "CPSAT_SOLVER"
+
+    def __init__(self, threads=None, **kwargs):
+        super().__init__(**kwargs)
+        self.threads = threads
+
+    def available(self):
+        try:
+            from ortools.sat.python import cp_model
+        except ImportError:
+            return False
+        return True
+
+    def actualSolve(self, lp, **kwargs):
+        from ortools.sat.python import cp_model
+
+        model = cp_model.CpModel()
+        cp_vars = {}
+        for var in lp.variables():
+            fixed = var.lowBound is not None and var.lowBound == var.upBound
+            if var.cat != pulp.LpInteger and not fixed:
+                raise ValueError(f"CP-SAT needs integer variables, got: {var.name}")
+            low = _CPSAT_UNBOUNDED * -1 if var.lowBound is None else var.lowBound
+            up = _CPSAT_UNBOUNDED if var.upBound is None else var.upBound
+            cp_vars[var.name] = model.NewIntVar(int(low), int(up), var.name)
+
+        def to_cp_expression(expression):
+            terms = [
+                _as_integer(coef) * cp_vars[var.name]
+                for var, coef in expression.items()
+            ]
+            return sum(terms, _as_integer(expression.constant))
+
+        for constraint in lp.constraints.values():
+            expression = to_cp_expression(constraint)
+            if constraint.sense == pulp.LpConstraintLE:
+                model.Add(expression <= 0)
+            elif constraint.sense == pulp.LpConstraintGE:
+                model.Add(expression >= 0)
+            else:
+                model.Add(expression == 0)
+        if lp.objective is not None and lp.objective.items():
+            if lp.sense == pulp.LpMinimize:
+                model.Minimize(to_cp_expression(lp.objective))
+            else:
+                model.Maximize(to_cp_expression(lp.objective))
+
+        solver = cp_model.CpSolver()
+        if self.timeLimit is not None:
+            solver.parameters.max_time_in_seconds = self.timeLimit
+        solver.parameters.log_search_progress = bool(self.msg)
+        if self.threads:
+            solver.parameters.num_workers = self.threads
+        status = solver.Solve(model)
+
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            lp.assignVarsVals(
+                {name: solver.Value(var) for name, var in cp_vars.items()}
+            )
+            solution_status = (
+                pulp.LpSolutionOptimal
+                if status == cp_model.OPTIMAL
+                else pulp.LpSolutionIntegerFeasible
+            )
+            lp.assignStatus(pulp.LpStatusOptimal, solution_status)
+        elif status == cp_model.INFEASIBLE:
+            lp.assignStatus(pulp.LpStatusInfeasible)
+        else:
+            lp.assignStatus(pulp.LpStatusNotSolved)
+        return lp.status
+
+
+def _as_integer(coefficient):
+    if coefficient != int(coefficient):
+        raise ValueError(f"CP-SAT needs integral coefficients, got: {coefficient}")
+    return int(coefficient)
+
+
+def get_solver(backend=None):
+    """Returns a quiet PuLP solver of the given backend (cfg.milp_backend if
+    None) using the threads granted by core.resources"""
+    if backend is None:
+        backend = cfg.milp_backend
+    threads = resources.solver_threads() or None
+    if backend == GUROBI:
+        # OutputFlag goes first: gurobipy echoes parameters set before it
+        gurobi_params = {"OutputFlag": 0}
+        if threads:
+            gurobi_params["Threads"] = threads
+        return pulp.GUROBI(msg=0, **gurobi_params)
+    if backend == HIGHS:
+        return pulp.HiGHS(msg=0, threads=threads)
+    if backend == CBC:
+        return pulp.PULP_CBC_CMD(msg=0, threads=threads)
+    if backend == CPSAT:
+        return CPSAT_SOLVER(msg=0, threads=threads)
+    raise ValueError(f"Unknown MILP backend: {backend}")
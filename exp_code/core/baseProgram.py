@@ -21,14 +21,23 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
+# The committee, mesh and PAV models below are built with gurobipy and need
+# Gurobi (and its licence) whatever cfg.milp_backend says: they rely on
+# solution pools, lazy constraints added from callbacks and incremental
+# re-optimization of a kept model, which core.backends does not abstract. Only
+# the xJR verification of the found committees (isxJRChecker) goes through the
+# backend chosen in core.backends
 from gurobipy import *
 import multiprocessing as mproc
 
 import core.cfg as cfg
 import core.mylog as mylog
+import core.resources as resources
 
 logger = mylog.get_logger()
 import isxJRChecker
+import elections
+import lccache
 from datetime import datetime
 
 import math
@@ -36,8 +45,14 @@ import math
 CANDIDATE_VARIABLE_NAME = "cc"
 COVERAGE_VARIABLE_NAME = "coverage"
 APPROVAL_VARIABLE_NAME = "approvalScore"
+CORE_SIZE_VARIABLE_NAME = "coreSize"
 
 JR_CONSTRAINT_NAME = "jrconstraint"
+LOWER_APPROVAL_CONSTRAINT_NAME = "lab"
+UPPER_APPROVAL_CONSTRAINT_NAME = "uab"
+LOWER_COVERAGE_CONSTRAINT_NAME = "lcb"
+UPPER_COVERAGE_CONSTRAINT_NAME = "ucb"
+CORE_SIZE_CONSTRAINT_NAME = "coresize"
 
 COMM_OF_GIVEN_SIZE = 0
 CORE_MIN = 1
@@ -46,6 +61,16 @@ APPROVAL_MIN = 3
 COVERAGE_MAX = 4
 COVERAGE_MIN = 5
 
+# the variable and the sense of the objective of each goal
+GOAL_OBJECTIVES = {
+    COMM_OF_GIVEN_SIZE: (CORE_SIZE_VARIABLE_NAME, GRB.MINIMIZE),
+    CORE_MIN: (CORE_SIZE_VARIABLE_NAME, GRB.MINIMIZE),
+    APPROVAL_MAX: (APPROVAL_VARIABLE_NAME, GRB.MAXIMIZE),
+    APPROVAL_MIN: (APPROVAL_VARIABLE_NAME, GRB.MINIMIZE),
+    COVERAGE_MAX: (COVERAGE_VARIABLE_NAME, GRB.MAXIMIZE),
+    COVERAGE_MIN: (COVERAGE_VARIABLE_NAME, GRB.MINIMIZE),
+}
+
 COMPUTE_EJR = 0
 COMPUTE_PJR = 1
 
@@ -64,34 +89,223 @@ def compute(
     requireJR=True,
     just_group_size=None,
 ):
+    return BoundedCommitteeModel(
+        candidates, voters, committeeSize, goal, requireJR, just_group_size
+    ).solve(lab, uab, lcb, ucb)
 
-    try:
-        m, _, _ = _basicModel(
+
+class BoundedCommitteeModel(object):
+    """The model of _basicModel built once for an election, a committee size,
+    a goal and requireJR; solving it for other approval score and coverage
+    bounds only changes the right-hand sides of the four bound constraints.
+    Meant to be held by the rules.*Committee classes across mesh areas.
+
+    The committees found so far warm-start the next solves: one known to land
+    within the new bounds becomes the MIP start and the last found one the
+    variable hints (neighbouring mesh areas have similar committees)"""
+
+    def __init__(
+        self,
+        candidates,
+        voters,
+        committeeSize,
+        goal=COMM_OF_GIVEN_SIZE,
+        requireJR=True,
+        just_group_size=None,
+    ):
+        self._candidates = candidates
+        self._voters = voters
+        self._committee_size = committeeSize
+        self._key = (goal, requireJR, just_group_size)
+        self.model, self.voter_vars, self.candidate_vars = _basicModel(
             candidates,
             voters,
-            lab,
-            uab,
-            lcb,
-            ucb,
+            0,
+            len(voters) * committeeSize,
+            0,
+            len(voters),
             committeeSize,
             goal,
             requireJR,
             just_group_size,
+            break_clone_symmetry=True,
         )
+        self.model.update()
+        self._bound_constraints = {
+            name: self.model.getConstrByName(name)
+            for name in (
+                LOWER_APPROVAL_CONSTRAINT_NAME,
+                UPPER_APPROVAL_CONSTRAINT_NAME,
+                LOWER_COVERAGE_CONSTRAINT_NAME,
+                UPPER_COVERAGE_CONSTRAINT_NAME,
+            )
+        }
+        self._last_committee = None
+        self._committees_by_scores = {}
+
+    def is_for(
+        self,
+        candidates,
+        voters,
+        committeeSize,
+        goal=COMM_OF_GIVEN_SIZE,
+        requireJR=True,
+        just_group_size=None,
+    ):
+        return (
+            self._candidates is candidates
+            and self._voters is voters
+            and self._committee_size == committeeSize
+            and self._key == (goal, requireJR, just_group_size)
+        )
+
+    def set_bounds(self, lab, uab, lcb, ucb):
+        for name, bound in (
+            (LOWER_APPROVAL_CONSTRAINT_NAME, lab),
+            (UPPER_APPROVAL_CONSTRAINT_NAME, uab),
+            (LOWER_COVERAGE_CONSTRAINT_NAME, lcb),
+            (UPPER_COVERAGE_CONSTRAINT_NAME, ucb),
+        ):
+            self._bound_constraints[name].RHS = bound
+
+    def set_warm_start(self, lab, uab, lcb, ucb):
+        start = None
+        for scores, committee in self._committees_by_scores.items():
+            coverage, approval_score = scores
+            if lcb <= coverage <= ucb and lab <= approval_score <= uab:
+                start = committee
+                break
+        for cand_id, cand_var in self.candidate_vars.items():
+            cand_var.Start = GRB.UNDEFINED if start is None else int(cand_id in start)
+            cand_var.VarHintVal = (
+                GRB.UNDEFINED
+                if self._last_committee is None
+                else int(cand_id in self._last_committee)
+            )
+
+    def record_committee(self, committee, coverage, approval_score):
+        """Stores a found (and accepted) committee for warm starts"""
+        committee = frozenset(committee)
+        self._last_committee = committee
+        self._committees_by_scores[(coverage, approval_score)] = committee
+
+    def solved_committee(self):
+        return [
+            cand_id
+            for cand_id, cand_var in self.candidate_vars.items()
+            if int(round(cand_var.X, 0)) == 1
+        ]
+
+    def optimize_goal(self, goal, start=None):
+        """Optimal value of goal (see GOAL_OBJECTIVES) over the committees
+        within the current bounds, or None if there is none. Only the
+        objective of the model is re-targeted (for CORE_MIN the committee size
+        becomes an upper bound); both are restored afterwards. start is an
+        optional committee for the MIP start"""
+        m = self.model
+        size_constraint = m.getConstrByName(CORE_SIZE_CONSTRAINT_NAME)
+        try:
+            variable_name, sense = GOAL_OBJECTIVES[goal]
+            m.setObjective(m.getVarByName(variable_name), sense)
+            if goal == CORE_MIN and size_constraint is not None:
+                size_constraint.Sense = GRB.LESS_EQUAL
+            for cand_id, cand_var in self.candidate_vars.items():
+                cand_var.Start = (
+                    GRB.UNDEFINED if start is None else int(cand_id in start)
+                )
+            resources.set_model_threads(m)
+            m.optimize()
+            if not m.Status == GRB.OPTIMAL:
+                return None
+            return int(round(m.objVal, 0))
+        except GurobiError as e:
+            print(f"Error reported: {e}")
+        finally:
+            variable_name, sense = GOAL_OBJECTIVES[self._key[0]]
+            m.setObjective(m.getVarByName(variable_name), sense)
+            if size_constraint is not None:
+                size_constraint.Sense = GRB.EQUAL
+
+    def solve(self, lab, uab, lcb, ucb):
+        """Same results as compute"""
+        try:
+            m = self.model
+            self.set_bounds(lab, uab, lcb, ucb)
+            self.set_warm_start(lab, uab, lcb, ucb)
+            resources.set_model_threads(m)
+            m.optimize()
+            if not m.Status == GRB.OPTIMAL:
+                return False, None
+            else:
+                cov_var = m.getVarByName(COVERAGE_VARIABLE_NAME)
+                app_var = m.getVarByName(APPROVAL_VARIABLE_NAME)
+                coverage = int(round(cov_var.X, 0))
+                approval_score = int(round(app_var.X, 0))
+                self.record_committee(self.solved_committee(), coverage, approval_score)
+                return (True, int(round(m.objVal)), coverage, approval_score)
+        except GurobiError as e:
+            print(f"Error reported: {e}")
+
+
+def stream_pool_solutions(
+    m, candidates, optimal_only=False, initial_pool_size=1, max_pool_size=1024
+):
+    """Yields (objective, coverage, approval score, committee) for the
+    solutions of m as solution pools are found. The pool size starts at
+    initial_pool_size and doubles (up to max_pool_size) after each pool, whose
+    committees are then excluded by no-good constraints; the enumeration
+    ends with a pool that is not full. A consumer that stops iterating does
+    not pay for the remaining pools. With optimal_only, pools worse than the
+    first one are not reported"""
+    m.setParam(GRB.Param.PoolSearchMode, 2)
+    m.setParam(GRB.Param.PoolGap, 0)
+    m.setParam(GRB.Param.MIPGap, 0)
+    pool_size = initial_pool_size
+    best_objective = None
+    while True:
+        m.setParam(GRB.Param.PoolSolutions, pool_size)
+        resources.set_model_threads(m)
+        m.update()
         m.optimize()
         if not m.Status == GRB.OPTIMAL:
-            return False, None
-        else:
-            cov_var = m.getVarByName(COVERAGE_VARIABLE_NAME)
-            app_var = m.getVarByName(APPROVAL_VARIABLE_NAME)
-            return (
-                True,
-                int(m.objVal),
-                int(round(cov_var.X, 0)),
-                int(round(app_var.X, 0)),
+            logger.debug(f"No (more) JR justifying groups found")
+            return
+        if best_objective is None:
+            best_objective = m.objVal
+        elif optimal_only and m.objVal > best_objective:
+            return
+        logger.debug(f"JR justifying groups count: {m.SolCount}")
+        candidate_vars = [
+            m.getVarByName("{}[{}]".format(CANDIDATE_VARIABLE_NAME, cand_id))
+            for cand_id in candidates
+        ]
+        var_of_candidate = dict(zip(candidates, candidate_vars))
+        cov_var = m.getVarByName(COVERAGE_VARIABLE_NAME)
+        app_var = m.getVarByName(APPROVAL_VARIABLE_NAME)
+        committees = []
+        for sol_number in range(m.SolCount):
+            m.Params.SolutionNumber = sol_number
+            committee = [
+                cand_id
+                for cand_id, cand_var in zip(candidates, candidate_vars)
+                if int(round(cand_var.Xn, 0)) == 1
+            ]
+            committees.append(committee)
+            yield (
+                int(round(m.poolObjVal)),
+                int(round(cov_var.Xn, 0)),
+                int(round(app_var.Xn, 0)),
+                committee,
             )
-    except GurobiError as e:
-        print(f"Error reported: {e}")
+        if m.SolCount < pool_size:
+            return
+        for committee in committees:
+            m.addConstr(
+                quicksum(var_of_candidate[cand_id] for cand_id in committee)
+                <= len(committee) - 1
+            )
+        pool_size = min(2 * pool_size, max_pool_size)
+        logger.debug(f"Computing next solution pool of size {pool_size}")
 
 
 def enumerate_specific_jr_groups_comp_hints(
@@ -137,6 +351,8 @@ def enumerate_specific_jr_groups_comp_hints(
             goal,
             requireJR,
             just_group_size,
+            break_clone_symmetry=True,
+            usable_cands=available_candidates,
         )
 
         m.update()
@@ -165,65 +381,9 @@ def enumerate_specific_jr_groups_comp_hints(
                     == 0
                 )
 
-        solutions_chunk = 10
-        m.setParam(GRB.Param.PoolSearchMode, 2)
-        # Get solutions_chunk possible solutions
-        m.setParam(GRB.Param.PoolSolutions, solutions_chunk)
-        m.setParam(GRB.Param.PoolGap, 0)
-        m.setParam(GRB.Param.MIPGap, 0)
-
-        continue_computing = True
-
-        while continue_computing:
-            m.update()
-            m.optimize()
-            if not m.Status == GRB.OPTIMAL:
-                logger.debug(f"No minimum JR justifying groups found")
-                break
-            solutions = []
-            logger.debug(f"JR justifying groups count: {m.SolCount}")
-            for sol_number in range(m.SolCount):
-                committee = []
-                m.Params.SolutionNumber = sol_number
-                for candId in candidates:
-                    candVar = m.getVarByName(
-                        "{}[{}]".format(CANDIDATE_VARIABLE_NAME, candId)
-                    )
-                    if int(round(candVar.Xn, 0)) == 1:
-                        committee.append(candId)
-                cov_var = m.getVarByName(COVERAGE_VARIABLE_NAME)
-                app_var = m.getVarByName(APPROVAL_VARIABLE_NAME)
-                solutions.append(
-                    (
-                        int(m.poolObjVal),
-                        int(round(cov_var.Xn, 0)),
-                        int(round(app_var.Xn, 0)),
-                        committee,
-                    )
-                )
-            continue_computing = m.solCount == solutions_chunk
-            for solution in solutions:
-                # logger.info(f"yielding: {solution}")
-                yield (True, solution)
-            for _, _, _, forbidden_committee in solutions:
-                m.addConstr(
-                    quicksum(
-                        m.getVarByName(
-                            "{}[{}]".format(CANDIDATE_VARIABLE_NAME, cand_id)
-                        )
-                        for cand_id in forbidden_committee
-                    )
-                    <= (
-                        (
-                            just_group_size
-                            if just_group_size is not None
-                            else committeeSize
-                        )
-                        - 1
-                    )
-                )
-            if continue_computing:
-                logger.debug(f"Computing next solution pool")
+        for solution in stream_pool_solutions(m, candidates):
+            # logger.info(f"yielding: {solution}")
+            yield (True, solution)
     except GurobiError as e:
         print(f"Error reported: {e}")
     # logger.info("Finishing")
@@ -255,6 +415,8 @@ def enumerate_groups(
             goal,
             requireJR,
             just_group_size,
+            break_clone_symmetry=True,
+            usable_cands=usable_cands,
         )
 
         m.update()
@@ -262,43 +424,27 @@ def enumerate_groups(
             candVar = m.getVarByName("{}[{}]".format(CANDIDATE_VARIABLE_NAME, cand_id))
             m.addConstr(candVar == 0)
 
-        m.setParam(GRB.Param.PoolSearchMode, 2)
-        # Use maximum possible number of solutions
-        m.setParam(GRB.Param.PoolSolutions, 2000000000)
-        m.setParam(GRB.Param.PoolGap, 0)
-        m.setParam(GRB.Param.MIPGap, 0)
-        m.optimize()
-        if not m.Status == GRB.OPTIMAL:
+        solutions = list(stream_pool_solutions(m, candidates, optimal_only=True))
+        if not solutions:
             logger.info(f"No minimum JR justifying groups found")
             return False, None
-        solutions = []
-        logger.info(f"Minimum JR justifying groups count: {m.SolCount}")
-        for sol_number in range(m.SolCount):
-            committee = []
-            m.Params.SolutionNumber = sol_number
-            for candId in candidates:
-                candVar = m.getVarByName(
-                    "{}[{}]".format(CANDIDATE_VARIABLE_NAME, candId)
-                )
-                if int(round(candVar.Xn, 0)) == 1:
-                    committee.append(candId)
-            cov_var = m.getVarByName(COVERAGE_VARIABLE_NAME)
-            app_var = m.getVarByName(APPROVAL_VARIABLE_NAME)
-            solutions.append(
-                (
-                    int(m.poolObjVal),
-                    int(round(cov_var.Xn, 0)),
-                    int(round(app_var.Xn, 0)),
-                    committee,
-                )
-            )
+        logger.info(f"Minimum JR justifying groups count: {len(solutions)}")
         return True, solutions
     except GurobiError as e:
         print(f"Error reported: {e}")
 
 
 def computeEJR(
-    candidates, voters, lab, uab, lcb, ucb, committeeSize, relevant_cands=None
+    candidates,
+    voters,
+    lab,
+    uab,
+    lcb,
+    ucb,
+    committeeSize,
+    relevant_cands=None,
+    bounded_model=None,
+    xjr_verifier=None,
 ):
     return computeEJRorPJR(
         candidates,
@@ -309,12 +455,23 @@ def computeEJR(
         ucb,
         committeeSize,
         COMPUTE_EJR,
-        relevant_cands,
+        pjr_ejr_relevant_cands=relevant_cands,
+        bounded_model=bounded_model,
+        xjr_verifier=xjr_verifier,
     )
 
 
 def computePJR(
-    candidates, voters, lab, uab, lcb, ucb, committeeSize, relevant_cands=None
+    candidates,
+    voters,
+    lab,
+    uab,
+    lcb,
+    ucb,
+    committeeSize,
+    relevant_cands=None,
+    bounded_model=None,
+    xjr_verifier=None,
 ):
     return computeEJRorPJR(
         candidates,
@@ -325,7 +482,9 @@ def computePJR(
         ucb,
         committeeSize,
         COMPUTE_PJR,
-        relevant_cands,
+        pjr_ejr_relevant_cands=relevant_cands,
+        bounded_model=bounded_model,
+        xjr_verifier=xjr_verifier,
     )
 
 
@@ -333,13 +492,10 @@ def compute_pav(
     candidates, voters, lab, uab, lcb, ucb, committeeSize, satisfactionLevel=None
 ):
     try:
-        if isinstance(voters, list):
-            voters = dict(
-                (index_voter[0], index_voter[1].approvals)
-                for index_voter in enumerate(voters)
-            )
+        profile, voters, weights = _weighted_ballots(candidates, voters)
         m = Model("MaxApproval")
         m.setParam("OutputFlag", False)
+        resources.set_model_threads(m)
 
         indicatorVCOVars = m.addVars(
             len(voters), len(candidates), committeeSize, vtype=GRB.BINARY
@@ -354,7 +510,7 @@ def compute_pav(
         )
 
         coreSizeVar = m.addVar(
-            name="coreSize", vtype=GRB.INTEGER, lb=0, ub=committeeSize
+            name=CORE_SIZE_VARIABLE_NAME, vtype=GRB.INTEGER, lb=0, ub=committeeSize
         )
 
         approvalScoreVar = m.addVar(
@@ -395,18 +551,17 @@ def compute_pav(
             (voterVars[j] >= candidateVars[i]) for j in voters.keys() for i in voters[j]
         )
 
-        m.addConstr(coverageVar == quicksum(voterVars[j] for j in voters.keys()))
+        m.addConstr(
+            coverageVar == quicksum(weights[j] * voterVars[j] for j in voters.keys())
+        )
 
         m.addConstr(coverageVar <= ucb)
         m.addConstr(coverageVar >= lcb)
 
         m.addConstr(
             approvalScoreVar
-            == (
-                quicksum(
-                    quicksum(candidateVars[i] for j in voters.keys() if i in voters[j])
-                    for i in candidates
-                )
+            == quicksum(
+                int(profile.support_counts[i]) * candidateVars[i] for i in candidates
             )
         )
 
@@ -418,7 +573,7 @@ def compute_pav(
             for cand in candidates:
                 for k in range(committeeSize):
                     owaCoeff = float(1 / float(k + 1))
-                    voterLikesCandidateCoeff = 1 if cand in vote else 0
+                    voterLikesCandidateCoeff = weights[vnr] if cand in vote else 0
                     coefficients[(vnr, cand, k)] = owaCoeff * float(
                         voterLikesCandidateCoeff
                     )
@@ -451,6 +606,116 @@ def compute_pav(
         print("Error reported: {}".format(GErr))
 
 
+def compute_compact_pav(
+    candidates,
+    voters,
+    lab,
+    uab,
+    lcb,
+    ucb,
+    committeeSize,
+    satisfactionLevel=None,
+    start=None,
+):
+    """PAV over the committees within the bounds. Unlike compute_pav, there
+    is one binary variable per (weighted) ballot and committee position: the
+    positions of a ballot are filled in order, as many as it has
+    representatives, so the satisfaction is exactly the PAV score. start is an
+    optional committee for the MIP start. Returns (success, satisfaction,
+    committee, coverage, approval score)"""
+    try:
+        profile, voters, weights = _weighted_ballots(candidates, voters)
+        positions = range(1, committeeSize + 1)
+        m = Model("CompactPAV")
+        m.setParam("OutputFlag", False)
+        resources.set_model_threads(m)
+
+        candidateVars = m.addVars(
+            candidates, name=CANDIDATE_VARIABLE_NAME, vtype=GRB.BINARY
+        )
+        positionVars = m.addVars(voters.keys(), positions, vtype=GRB.BINARY)
+        approvalScoreVar = m.addVar(
+            name=APPROVAL_VARIABLE_NAME, vtype=GRB.INTEGER, lb=0
+        )
+        coverageVar = m.addVar(name=COVERAGE_VARIABLE_NAME, vtype=GRB.INTEGER, lb=0)
+        satisfactionVar = m.addVar(name="satisfaction", vtype=GRB.CONTINUOUS, lb=0)
+
+        m.addConstr(quicksum(candidateVars[i] for i in candidates) == committeeSize)
+        m.addConstrs(
+            positionVars.sum(j, "*") == quicksum(candidateVars[i] for i in voters[j])
+            for j in voters.keys()
+        )
+        m.addConstrs(
+            positionVars[j, pos] >= positionVars[j, pos + 1]
+            for j in voters.keys()
+            for pos in positions[:-1]
+        )
+
+        # a ballot is covered iff its first position is filled
+        m.addConstr(
+            coverageVar
+            == quicksum(weights[j] * positionVars[j, 1] for j in voters.keys())
+        )
+        m.addConstr(coverageVar <= ucb)
+        m.addConstr(coverageVar >= lcb)
+
+        m.addConstr(
+            approvalScoreVar
+            == quicksum(
+                int(profile.support_counts[i]) * candidateVars[i] for i in candidates
+            )
+        )
+        m.addConstr(approvalScoreVar <= uab)
+        m.addConstr(approvalScoreVar >= lab)
+
+        m.addConstr(
+            satisfactionVar
+            == quicksum(
+                weights[j] / pos * positionVars[j, pos]
+                for j in voters.keys()
+                for pos in positions
+            )
+        )
+        if satisfactionLevel == None:
+            m.setObjective(satisfactionVar, GRB.MAXIMIZE)
+        else:
+            m.addConstr(satisfactionVar == satisfactionLevel)
+
+        if start is not None:
+            for cand_id, cand_var in candidateVars.items():
+                cand_var.Start = int(cand_id in start)
+
+        m.optimize()
+
+        if not m.Status == GRB.OPTIMAL:
+            return False, None, None, None, None
+        committee = [
+            cand_id
+            for cand_id, cand_var in candidateVars.items()
+            if int(round(cand_var.X, 0)) == 1
+        ]
+        return (
+            True,
+            satisfactionVar.X,
+            committee,
+            int(round(coverageVar.X, 0)),
+            int(round(approvalScoreVar.X, 0)),
+        )
+
+    except GurobiError as GErr:
+        print("Error reported: {}".format(GErr))
+
+
+def _weighted_ballots(candidates, voters):
+    """Voters casting identical ballots are merged into one weighted voter;
+    returns the profile of all the voters, a dictionary mapping ballot indices
+    to approval sets and the list of the ballots' weights (see
+    elections.ApprovalProfile.ballot_types)"""
+    profile = elections.as_profile(voters, max(candidates, default=-1) + 1)
+    ballots, weights, _ = profile.ballot_types()
+    return (profile, ballots.approval_sets(), weights.tolist())
+
+
 def _basicModel(
     candidates,
     voters,
@@ -462,7 +727,19 @@ def _basicModel(
     goal,
     requireJR,
     just_group_size=None,
+    break_clone_symmetry=False,
+    usable_cands=None,
 ):
+    """With break_clone_symmetry, only one committee out of those differing by
+    a permutation of clones (candidates with identical supporters, see
+    elections.ApprovalProfile.clone_classes) stays feasible: the one taking
+    the clones of the lowest ids. Every such committee has the same coverage,
+    approval score and JR/PJR/EJR status, so solution pools and no-good loops
+    do not revisit equivalent committees. If only usable_cands can be
+    selected, clones are ordered among them only.
+
+    There is one (weighted) voter variable per distinct ballot"""
+
     def approvalMaximization():
         m.setObjective(approvalScoreVar, GRB.MAXIMIZE)
 
@@ -478,14 +755,11 @@ def _basicModel(
     def coreMinimization():
         m.setObjective(coreSizeVar, GRB.MINIMIZE)
 
-    if isinstance(voters, list):
-        voters = dict(
-            (index_voter[0], index_voter[1].approvals)
-            for index_voter in enumerate(voters)
-        )
+    profile, voters, weights = _weighted_ballots(candidates, voters)
     try:
         m = Model("MaxApproval")
         m.setParam("OutputFlag", False)
+        resources.set_model_threads(m)
 
         candidateVars = m.addVars(
             candidates, name=CANDIDATE_VARIABLE_NAME, vtype=GRB.BINARY
@@ -496,7 +770,7 @@ def _basicModel(
         )
 
         coreSizeVar = m.addVar(
-            name="coreSize", vtype=GRB.INTEGER, lb=0, ub=committeeSize
+            name=CORE_SIZE_VARIABLE_NAME, vtype=GRB.INTEGER, lb=0, ub=committeeSize
         )
 
         approvalScoreVar = m.addVar(
@@ -515,9 +789,9 @@ def _basicModel(
                     "JR concept required. For what the group should be justifying then?"
                 )
             if just_group_size:
-                m.addConstr(coreSizeVar == just_group_size)
+                m.addConstr(coreSizeVar == just_group_size, CORE_SIZE_CONSTRAINT_NAME)
             else:
-                m.addConstr(coreSizeVar == committeeSize)
+                m.addConstr(coreSizeVar == committeeSize, CORE_SIZE_CONSTRAINT_NAME)
 
         m.addConstr(quicksum(candidateVars[i] for i in candidates) == coreSizeVar)
         m.addConstrs(
@@ -530,34 +804,46 @@ def _basicModel(
 
         if requireJR:
             smallerThanCohesiveSize = int(
-                math.ceil(float(len(voters)) / float(committeeSize) - 1)
+                math.ceil(float(profile.voters_count) / float(committeeSize) - 1)
             )
             m.addConstrs(
                 (
-                    quicksum(1 - voterVars[j] for j in voters.keys() if i in voters[j])
+                    quicksum(
+                        weights[j] * (1 - voterVars[j])
+                        for j in voters.keys()
+                        if i in voters[j]
+                    )
                     <= smallerThanCohesiveSize
                     for i in candidates
                 ),
                 JR_CONSTRAINT_NAME,
             )
 
-        m.addConstr(coverageVar == quicksum(voterVars[j] for j in voters.keys()))
+        if break_clone_symmetry:
+            if usable_cands is None:
+                usable_cands = candidates
+            for clones in profile.clone_classes(set(candidates) & set(usable_cands)):
+                m.addConstrs(
+                    candidateVars[clone] >= candidateVars[next_clone]
+                    for clone, next_clone in zip(clones, clones[1:])
+                )
 
-        m.addConstr(coverageVar <= ucb)
-        m.addConstr(coverageVar >= lcb)
+        m.addConstr(
+            coverageVar == quicksum(weights[j] * voterVars[j] for j in voters.keys())
+        )
+
+        m.addConstr(coverageVar <= ucb, UPPER_COVERAGE_CONSTRAINT_NAME)
+        m.addConstr(coverageVar >= lcb, LOWER_COVERAGE_CONSTRAINT_NAME)
 
         m.addConstr(
             approvalScoreVar
-            == (
-                quicksum(
-                    quicksum(candidateVars[i] for j in voters.keys() if i in voters[j])
-                    for i in candidates
-                )
+            == quicksum(
+                int(profile.support_counts[i]) * candidateVars[i] for i in candidates
             )
         )
 
-        m.addConstr(approvalScoreVar <= uab)
-        m.addConstr(approvalScoreVar >= lab)
+        m.addConstr(approvalScoreVar <= uab, UPPER_APPROVAL_CONSTRAINT_NAME)
+        m.addConstr(approvalScoreVar >= lab, LOWER_APPROVAL_CONSTRAINT_NAME)
 
         if goal == COMM_OF_GIVEN_SIZE or goal == CORE_MIN:
             coreMinimization()
@@ -576,6 +862,32 @@ def _basicModel(
         print("Error reported: {}".format(GErr))
 
 
+def make_xjr_verifier(
+    candidates, voters, committeeSize, whatToCompute, pjr_ejr_relevant_cands=None
+):
+    """The verifier of the committees found by computeEJRorPJR; it only
+    depends on the election, so it can be shared by all calls for it. Its
+    per-ell checks are ordered using the (cached, see lccache) large cohesive
+    groups analysis"""
+    verified_axioms = {
+        COMPUTE_EJR: isxJRChecker.EJR,
+        COMPUTE_PJR: isxJRChecker.PJR,
+    }
+    if whatToCompute not in verified_axioms:
+        raise ValueError(
+            "Neither ejr nor pjr requested. Use constants to specify a correct goal."
+        )
+    profile = elections.as_profile(voters, len(candidates))
+    return isxJRChecker.XJRVerifier(
+        profile,
+        committeeSize,
+        verified_axioms[whatToCompute],
+        pjr_ejr_relevant_cands,
+        plus_screening=True,
+        lc_analysis=lccache.large_cohesive_groups_analysis(profile, committeeSize),
+    )
+
+
 def computeEJRorPJR(
     candidates,
     voters,
@@ -587,7 +899,13 @@ def computeEJRorPJR(
     whatToCompute,
     goal=COMM_OF_GIVEN_SIZE,
     pjr_ejr_relevant_cands=None,
+    bounded_model=None,
+    xjr_verifier=None,
 ):
+    """bounded_model (a BoundedCommitteeModel for goal and requireJR) and
+    xjr_verifier (see make_xjr_verifier) can be reused between calls for the
+    same election; the cuts excluding the rejected committees stay valid for
+    all bounds, so they are kept in the model"""
 
     def log_computation_end(committee_counter, failed, searches_threshold=10):
         axiom = "EJR" if whatToCompute == COMPUTE_EJR else "PJR"
@@ -605,109 +923,81 @@ def computeEJRorPJR(
         dt_string = now.strftime("%d.%m.%Y %H:%M:%S")
         print(f"{ERASE_LINE_ASCII}{dt_string}: {toprint}", end="\r")
 
-    xJRCheckers = {
-        COMPUTE_EJR: isxJRChecker.isEJR_ilp,
-        COMPUTE_PJR: isxJRChecker.isPJR_ilp,
-    }
-    if isinstance(voters, list):
-        voters = dict(
-            (index_voter[0], index_voter[1].approvals)
-            for index_voter in enumerate(voters)
-        )
-
-    if whatToCompute not in [COMPUTE_EJR, COMPUTE_PJR]:
-        raise ValueError(
-            "Neither ejr nor pjr requested. Use constants to specify a correct goal."
+    if xjr_verifier is None:
+        xjr_verifier = make_xjr_verifier(
+            candidates, voters, committeeSize, whatToCompute, pjr_ejr_relevant_cands
         )
+    approval_sets = elections.as_approval_sets(voters)
 
     try:
-        m, _, candidate_vars = _basicModel(
-            candidates, voters, lab, uab, lcb, ucb, committeeSize, goal, True
-        )
+        if bounded_model is None:
+            bounded_model = BoundedCommitteeModel(
+                candidates, voters, committeeSize, goal, True
+            )
+        bounded_model.set_bounds(lab, uab, lcb, ucb)
+        bounded_model.set_warm_start(lab, uab, lcb, ucb)
+        m = bounded_model.model
+        candidate_vars = bounded_model.candidate_vars
+        committee_vars = [candidate_vars[cand_id] for cand_id in candidates]
         search_counter = 0
-        while True:
-            search_counter = search_counter + 1
-            m.update()
-            print_if_verbose(f"Getting {search_counter} committee")
-            m.optimize()
-            if not m.Status == GRB.OPTIMAL:
-                log_computation_end(search_counter, failed=True)
-                return False, None
-            else:
-                committee = []
-                committeeVars = []
-                for candId in candidates:
-                    candVar = m.getVarByName(
-                        "{}[{}]".format(CANDIDATE_VARIABLE_NAME, candId)
-                    )
-                    if int(round(candVar.X, 0)) == 1:
-                        committee.append(candId)
-                        committeeVars.append(candVar)
-                logger.debug(f"Checking commitee {committee} for EJR/PJR")
-                votersAsBinaryMatr = isxJRChecker.appListsProfilesToBinaryMatrix(
-                    voters.values(), candidates
-                )
-                print_if_verbose(
-                    f"Checking {search_counter} committee\t\t"
-                    f"Constraints {m.getAttr('NumConstrs')}"
-                )
-                xjr_check = xJRCheckers[whatToCompute](
-                    votersAsBinaryMatr, committee, committeeSize, pjr_ejr_relevant_cands
-                )
-                # DIRTY HACK --- because the function above can return either a tuple or only True/False
-                unhappy_group = None
-                if isinstance(xjr_check, tuple):
-                    check_ok = xjr_check[0]
-                    unhappy_group = xjr_check[1]
-                    failing_ell = xjr_check[2]
-                else:
-                    check_ok = xjr_check
-
-                if check_ok:
-                    cov_var = m.getVarByName(COVERAGE_VARIABLE_NAME)
-                    app_var = m.getVarByName(APPROVAL_VARIABLE_NAME)
-                    log_computation_end(search_counter, failed=False)
-                    print_if_verbose("")
-                    return (
-                        True,
-                        int(m.objVal),
-                        int(round(cov_var.X, 0)),
-                        int(round(app_var.X, 0)),
-                    )
-
-                m.addConstr(quicksum(committeeVars) <= len(committeeVars) - 1)
+        found_cuts = []
+
+        def xjr_cuts(committee, unhappy_group, failing_ell):
+            # the found committee is excluded and every EJR/PJR committee has
+            # to give the unhappy group failing_ell representatives
+            yield quicksum(candidate_vars[i] for i in committee) <= len(committee) - 1
+            represented_by = set()
+            for curr_voter in unhappy_group:
+                curr_approvals = approval_sets[curr_voter]
+                if whatToCompute == COMPUTE_EJR and len(curr_approvals) < failing_ell:
+                    # such a voter can never get failing_ell representatives
+                    continue
+                represented_by |= set(curr_approvals)
+            yield quicksum(candidate_vars[i] for i in represented_by) >= failing_ell
 
-                if unhappy_group is not None and (whatToCompute == COMPUTE_PJR):
-                    approvals_union = set()
-                    for curr_voter in unhappy_group:
-                        approvals_union = approvals_union.union(set(voters[curr_voter]))
-                    union_var = m.addVar(vtype=GRB.INTEGER, lb=0)
-                    m.addGenConstrNorm(
-                        union_var, [candidate_vars[i] for i in approvals_union], 1
-                    )
-                    m.addConstr(union_var >= failing_ell)
-
-                # We ensure that the enumeration takes into consideration the just found unhappy group
-                if unhappy_group is not None and (whatToCompute == COMPUTE_EJR):
-                    logger.debug("Unhappy groups discovered for EJR!")
-                    per_voter_vars = []
-                    for curr_voter in unhappy_group:
-                        curr_approvals = voters[curr_voter]
-                        logger.debug(
-                            f"Unhappy voter {curr_voter} approvals: {curr_approvals}"
-                        )
-                        if len(curr_approvals) < failing_ell:
-                            continue
-                        norm_var = m.addVar(vtype=GRB.INTEGER, lb=0)
-                        m.addGenConstrNorm(
-                            norm_var, [candidate_vars[i] for i in curr_approvals], 1
-                        )
-                        per_voter_vars.append(norm_var)
-                    max_var = m.addVar(vtype=GRB.INTEGER, lb=0)
-                    m.addGenConstrMax(max_var, per_voter_vars)
-                    m.addConstr(max_var >= failing_ell)
+        def check_incumbent(model, where):
+            nonlocal search_counter
+            if where != GRB.Callback.MIPSOL:
+                return
+            search_counter = search_counter + 1
+            values = model.cbGetSolution(committee_vars)
+            committee = [
+                cand_id
+                for cand_id, value in zip(candidates, values)
+                if int(round(value, 0)) == 1
+            ]
+            logger.debug(f"Checking commitee {committee} for EJR/PJR")
+            print_if_verbose(f"Checking {search_counter} committee")
+            check_ok, unhappy_group, failing_ell = xjr_verifier.check(committee)
+            if check_ok:
+                return
+            for cut in xjr_cuts(committee, unhappy_group, failing_ell):
+                model.cbLazy(cut)
+                found_cuts.append(cut)
+            print_if_verbose(f"Missed committees = {search_counter}")
+
+        # the xJR check of every incumbent is a lazy constraint callback, so
+        # the whole search is a single branch-and-cut solve
+        m.Params.LazyConstraints = 1
+        m.update()
+        resources.set_model_threads(m)
+        m.optimize(check_incumbent)
+        # the cuts are valid for any bounds, keep them for the next solves
+        for cut in found_cuts:
+            m.addConstr(cut)
 
-                print_if_verbose(f"Missed committees = {search_counter}")
+        if not m.Status == GRB.OPTIMAL:
+            log_computation_end(search_counter, failed=True)
+            return False, None
+        committee = bounded_model.solved_committee()
+        cov_var = m.getVarByName(COVERAGE_VARIABLE_NAME)
+        app_var = m.getVarByName(APPROVAL_VARIABLE_NAME)
+        coverage = int(round(cov_var.X, 0))
+        approval_score = int(round(app_var.X, 0))
+        bounded_model.record_committee(committee, coverage, approval_score)
+        log_computation_end(search_counter, failed=False)
+        print_if_verbose("")
+        return (True, int(round(m.objVal)), coverage, approval_score)
     except GurobiError as e:
         print("Gurobi Error reported: " + str(e))
     except Exception as e:
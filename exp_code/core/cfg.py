@@ -22,3 +22,20 @@
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
 is_verbose = False
+
+# MILP backend of the PuLP models, one of core.backends.BACKENDS
+milp_backend = "gurobi"
+
+# Number of processes solving the per-ell ILPs of a single EJR/PJR check in
+# parallel (see isxJRChecker.parallel_violation_check); None or 1 is serial
+xjr_check_processes = None
+
+# Solver threads shared by the busy workers of a process pool (see
+# core.resources); None is all cores
+solver_threads_budget = None
+
+# Results of the large cohesive groups analysis kept in memory by each process
+# (see lccache), and the SQLite file keeping them across processes and runs
+# (None disables it)
+lc_cache_size = 32
+lc_cache_path = None
@@ -0,0 +1,92 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Copyright 2025 Andrzej Kaczmarczyk<droodev@gmail.com>
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the “Software”), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+"""Solver thread budget of the processes of a pool. Every worker of a
+budgeted_pool counts itself as busy while it runs a Budgeted task; a model
+created (or re-solved) by a busy worker gets an equal share of the budget
+(cfg.solver_threads_budget, all cores by default) among the currently busy
+workers, so the share grows when other workers run out of tasks. Outside such
+pools the solvers use the whole budget"""
+
+import multiprocessing as mproc
+
+import core.cfg as cfg
+
+# shared count of the busy workers of the pool this process works for
+_busy_workers = None
+_budget = None
+
+
+def threads_budget():
+    if cfg.solver_threads_budget is not None:
+        return cfg.solver_threads_budget
+    return mproc.cpu_count()
+
+
+def init_worker(busy_workers, budget):
+    """Initializer of the workers of a budgeted pool"""
+    global _busy_workers, _budget
+    _busy_workers = busy_workers
+    _budget = budget
+
+
+def budgeted_pool_args():
+    """Arguments of init_worker for the workers of a new pool"""
+    return (mproc.Value("i", 0), threads_budget())
+
+
+def budgeted_pool(processes):
+    return mproc.Pool(
+        processes=processes, initializer=init_worker, initargs=budgeted_pool_args()
+    )
+
+
+def solver_threads():
+    """Threads of a model created or solved now; 0 lets the solver decide (no
+    budget set outside of pools)"""
+    if _busy_workers is None:
+        return cfg.solver_threads_budget or 0
+    return max(1, _budget // max(1, _busy_workers.value))
+
+
+def set_model_threads(model):
+    """Applies solver_threads to a gurobipy model"""
+    model.setParam("Threads", solver_threads())
+
+
+class Budgeted(object):
+    """Task of a budgeted pool: marks the worker as busy while it runs"""
+
+    def __init__(self, function):
+        self._function = function
+
+    def __call__(self, *args, **kwargs):
+        if _busy_workers is None:
+            return self._function(*args, **kwargs)
+        with _busy_workers.get_lock():
+            _busy_workers.value += 1
+        try:
+            return self._function(*args, **kwargs)
+        finally:
+            with _busy_workers.get_lock():
+                _busy_workers.value -= 1
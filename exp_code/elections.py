@@ -22,6 +22,12 @@
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
 from functools import reduce
+import hashlib
+
+import numpy as np
+
+# Number of set bits in every possible byte; used to count packed bit rows
+_POPCOUNT_TABLE = np.array([bin(b).count("1") for b in range(256)], dtype=np.uint32)
 
 
 class ApprovalPreference(object):
@@ -58,6 +64,197 @@ class ApprovalPreference(object):
         return iter(self._approvals)
 
 
+class ApprovalProfile(object):
+    """Compact, read-only view of approval ballots. Voters are rows and
+    candidates are columns of a boolean matrix, additionally kept as packed bit
+    rows per voter and per candidate so that supporter sets can be intersected
+    and counted with bitwise operations. Build it once per election (see
+    ApprovalElection.profile) and pass it around instead of re-deriving lists
+    of lists or dictionaries of sets"""
+
+    def __init__(self, binary_matrix):
+        matrix = np.array(binary_matrix, dtype=bool, ndmin=2)
+        if matrix.ndim != 2:
+            raise ValueError("Approval profile must be a two-dimensional matrix")
+        matrix.setflags(write=False)
+        self._matrix = matrix
+        self._voter_bits = np.packbits(matrix, axis=1)
+        self._candidate_bits = np.packbits(matrix.T, axis=1)
+        self._voter_bits.setflags(write=False)
+        self._candidate_bits.setflags(write=False)
+        self._support_counts = matrix.sum(axis=0)
+        self._approval_sets = None
+        self._binary_lists = None
+        self._ballot_types = None
+        self._fingerprint = None
+
+    @classmethod
+    def from_approval_sets(cls, approval_sets, candidates_count):
+        """approval_sets is an iterable of collections of approved candidates'
+        ordinal numbers (for example, ApprovalPreference objects)"""
+        matrix = np.zeros((len(approval_sets), candidates_count), dtype=bool)
+        for voter, approvals in enumerate(approval_sets):
+            matrix[voter, list(approvals)] = True
+        return cls(matrix)
+
+    @property
+    def voters_count(self):
+        return self._matrix.shape[0]
+
+    @property
+    def candidates_count(self):
+        return self._matrix.shape[1]
+
+    @property
+    def matrix(self):
+        """Read-only boolean matrix; voters are rows, candidates are columns"""
+        return self._matrix
+
+    @property
+    def voter_bits(self):
+        """Packed approval rows, one per voter"""
+        return self._voter_bits
+
+    @property
+    def candidate_bits(self):
+        """Packed supporter rows, one per candidate"""
+        return self._candidate_bits
+
+    @property
+    def support_counts(self):
+        return self._support_counts
+
+    @property
+    def approvals_count(self):
+        return int(self._support_counts.sum())
+
+    def approvals(self, voter):
+        return self.approval_sets()[voter]
+
+    def supporters(self, candidate):
+        return set(np.flatnonzero(self._matrix[:, candidate]).tolist())
+
+    def common_supporters(self, candidates):
+        """Packed row of voters approving all the given candidates"""
+        candidates = list(candidates)
+        if not candidates:
+            return np.packbits(np.ones(self.voters_count, dtype=bool))
+        return np.bitwise_and.reduce(self._candidate_bits[candidates], axis=0)
+
+    def voters_mask(self, voters):
+        """Packed row with the bits of the given voters set"""
+        mask = np.zeros(self.voters_count, dtype=bool)
+        mask[list(voters)] = True
+        return np.packbits(mask)
+
+    def unpack_voters(self, packed_voters):
+        unpacked = np.unpackbits(packed_voters, count=self.voters_count)
+        return np.flatnonzero(unpacked).tolist()
+
+    @staticmethod
+    def count_bits(packed):
+        return int(_POPCOUNT_TABLE[packed].sum())
+
+    def approval_sets(self):
+        """Dictionary mapping each voter's index to the frozenset of candidates
+        she approves; computed once and shared between callers"""
+        if self._approval_sets is None:
+            self._approval_sets = {
+                voter: frozenset(np.flatnonzero(row).tolist())
+                for voter, row in enumerate(self._matrix)
+            }
+        return self._approval_sets
+
+    def ballot_types(self):
+        """Identical ballots merged into weighted voters: a triple of the
+        profile of the distinct ballots, the vector of their weights (numbers
+        of voters casting them) and, for each ballot, the list of its voters;
+        computed once"""
+        if self._ballot_types is None:
+            ballots, voter_ballots, weights = np.unique(
+                self._matrix, axis=0, return_inverse=True, return_counts=True
+            )
+            voters_of_ballot = [[] for _ in range(len(ballots))]
+            for voter, ballot in enumerate(np.ravel(voter_ballots).tolist()):
+                voters_of_ballot[ballot].append(voter)
+            self._ballot_types = (ApprovalProfile(ballots), weights, voters_of_ballot)
+        return self._ballot_types
+
+    def fingerprint(self):
+        """Hex digest of the content hash of the profile (its shape and
+        approvals, voters in order); equal profiles get equal fingerprints.
+        Computed once"""
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            digest.update(np.array(self._matrix.shape, dtype=np.int64).tobytes())
+            digest.update(self._voter_bits.tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def clone_classes(self, candidates=None):
+        """Lists (sorted, of length at least two) of candidates among the given
+        ones (all by default) having identical supporter sets; such clones are
+        interchangeable in any committee"""
+        if candidates is None:
+            candidates = range(self.candidates_count)
+        classes = {}
+        for cand in sorted(candidates):
+            classes.setdefault(self._candidate_bits[cand].tobytes(), []).append(cand)
+        return [clones for clones in classes.values() if len(clones) > 1]
+
+    def candidate_support_map(self):
+        return {
+            cand: set(np.flatnonzero(column).tolist())
+            for cand, column in enumerate(self._matrix.T)
+        }
+
+    def binary_lists(self):
+        """Profile as a list of 0/1 lists (shared, do not modify)"""
+        if self._binary_lists is None:
+            self._binary_lists = self._matrix.astype(int).tolist()
+        return self._binary_lists
+
+    def __len__(self):
+        return self.voters_count
+
+
+def as_profile(voters, candidates_count=None):
+    """Returns an ApprovalProfile for any of the voters representations used
+    across the code: a profile itself, an election, a binary matrix (a list of
+    0/1 lists or a NumPy array), a list of ApprovalPreference objects or a
+    dictionary mapping consecutive voter indices to approval sets. The last
+    two require the number of candidates"""
+    if isinstance(voters, ApprovalProfile):
+        return voters
+    if isinstance(voters, ApprovalElection):
+        return voters.profile
+    if isinstance(voters, np.ndarray):
+        return ApprovalProfile(voters)
+    if isinstance(voters, dict):
+        voters = [voters[voter] for voter in range(len(voters))]
+    voters = list(voters)
+    if voters and not isinstance(voters[0], (ApprovalPreference, set, frozenset)):
+        return ApprovalProfile(voters)
+    if candidates_count is None:
+        raise ValueError("Number of candidates required to build a profile")
+    return ApprovalProfile.from_approval_sets(voters, candidates_count)
+
+
+def as_approval_sets(voters):
+    """Returns a dictionary mapping voters' indices to their approval sets,
+    reusing the one cached by a profile if possible"""
+    if isinstance(voters, ApprovalElection):
+        voters = voters.profile
+    if isinstance(voters, ApprovalProfile):
+        return voters.approval_sets()
+    if isinstance(voters, list):
+        return dict(
+            (index_voter[0], index_voter[1].approvals)
+            for index_voter in enumerate(voters)
+        )
+    return voters
+
+
 class ApprovalElection(object):
     """Single, immutable, approval-validated approval election"""
 
@@ -69,6 +266,7 @@ class ApprovalElection(object):
                     "There is a vote that approves a nonexistent candidate"
                 )
         self._votes = votes
+        self._profile = None
 
     @property
     def votes(self):
@@ -78,21 +276,20 @@ class ApprovalElection(object):
     def candidates(self):
         return self._candidates[:]
 
+    @property
+    def profile(self):
+        """Bit-packed approval profile of the election, built on first use"""
+        if self._profile is None:
+            self._profile = ApprovalProfile.from_approval_sets(
+                self._votes, len(self._candidates)
+            )
+        return self._profile
+
     def get_binary_representation(self):
-        return [vote.get_binary_representation(self.candidates) for vote in self.votes]
+        return self.profile.binary_lists()
 
     def get_candidate_support_map(self):
-        candidates_support = {}
-        ordered_voters = list(enumerate(self.votes))
-        for c in self.candidates:
-            candidates_support[c.ordinal_number] = set(
-                [
-                    ord_vot[0]
-                    for ord_vot in ordered_voters
-                    if (c.ordinal_number in ord_vot[1])
-                ]
-            )
-        return candidates_support
+        return self.profile.candidate_support_map()
 
     def get_vote(self, vote_id):
         return self._votes[vote_id]
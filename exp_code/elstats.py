@@ -21,10 +21,14 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
+import numpy as np
+
 import core.mylog
+import core.resources as resources
 
 logger = core.mylog.get_logger()
 import core.baseProgram as baseProgram
+from elections import as_profile
 from core.baseProgram import (
     APPROVAL_MAX,
     APPROVAL_MIN,
@@ -33,6 +37,56 @@ from core.baseProgram import (
     CORE_MIN,
 )
 
+# goals optimized over all committees and over JR committees
+STATISTICS_GOALS = {
+    False: (APPROVAL_MAX, APPROVAL_MIN, COVERAGE_MAX, COVERAGE_MIN),
+    True: (APPROVAL_MAX, APPROVAL_MIN, COVERAGE_MAX, COVERAGE_MIN, CORE_MIN),
+}
+
+
+def greedy_committee(profile, committee_size, goal):
+    """Cheap committee for the MIP start of a goal: the committee_size
+    candidates with the most (fewest) supporters for APPROVAL_MAX
+    (APPROVAL_MIN), greedily the largest (smallest) coverage gains for
+    COVERAGE_MAX (COVERAGE_MIN) and, for CORE_MIN, the largest coverage gains
+    until the committee is JR. Of clones (see
+    elections.ApprovalProfile.clone_classes) the lowest ids are taken"""
+    support = profile.support_counts
+    if goal in (APPROVAL_MAX, APPROVAL_MIN):
+        sign = -1 if goal == APPROVAL_MAX else 1
+        return set(np.argsort(sign * support, kind="stable")[:committee_size].tolist())
+    sign = -1 if goal == COVERAGE_MIN else 1
+    n = profile.voters_count
+    uncovered = np.ones(n, dtype=bool)
+    committee = set()
+    while len(committee) < committee_size:
+        uncovered_support = profile.matrix[uncovered].sum(axis=0)
+        if goal == CORE_MIN and uncovered_support.max() * committee_size < n:
+            break
+        gains = sign * uncovered_support
+        gains[list(committee)] = np.iinfo(gains.dtype).min
+        cand = int(np.argmax(gains))
+        committee.add(cand)
+        uncovered &= ~profile.matrix[:, cand]
+    for clones in profile.clone_classes():
+        chosen = len(committee.intersection(clones))
+        committee.difference_update(clones)
+        committee.update(clones[:chosen])
+    return committee
+
+
+def _optimal_values(task):
+    """Optimal values of the STATISTICS_GOALS for one requireJR, all found on
+    a single model"""
+    candidates, profile, committee_size, requireJR = task
+    model = baseProgram.BoundedCommitteeModel(
+        candidates, profile, committee_size, requireJR=requireJR
+    )
+    return {
+        goal: model.optimize_goal(goal, greedy_committee(profile, committee_size, goal))
+        for goal in STATISTICS_GOALS[requireJR]
+    }
+
 
 def dummyStats(cands, voters, commSize):
     logger.debug("Using dummy stats")
@@ -69,20 +123,6 @@ class Statistics(object):
         self.voters = voters
         self.committeeSize = committeeSize
 
-    def _computeHelper(self, goal, requireJR):
-        compute_result = baseProgram.compute(
-            self.candidates,
-            self.voters,
-            0,
-            self.votersNr * self.candidatesNr,
-            0,
-            self.votersNr,
-            self.committeeSize,
-            goal,
-            requireJR,
-        )
-        return compute_result[0], compute_result[1]
-
     def show(self, outFile):
         # formatStrings = [
         #     "Avg approvals by each voter: {}\n",
@@ -126,16 +166,28 @@ class Statistics(object):
         ]
         return "".join(fieldsInStrings)
 
-    def compute(self):
-        self.avgApp = (
-            float(sum([len(vot.approvals) for vot in self.voters])) / self.votersNr
-        )
-        success, self.maxApp = self._computeHelper(APPROVAL_MAX, False)
-        success, self.minApp = self._computeHelper(APPROVAL_MIN, False)
-        success, self.maxCov = self._computeHelper(COVERAGE_MAX, False)
-        success, self.minCov = self._computeHelper(COVERAGE_MIN, False)
-        success, self.maxJRApp = self._computeHelper(APPROVAL_MAX, True)
-        success, self.minJRApp = self._computeHelper(APPROVAL_MIN, True)
-        success, self.maxJRCov = self._computeHelper(COVERAGE_MAX, True)
-        success, self.minJRCov = self._computeHelper(COVERAGE_MIN, True)
-        success, self.justifiedCore = self._computeHelper(CORE_MIN, True)
+    def compute(self, processes=2):
+        """All bounds come from two models (over all committees and over JR
+        ones), each re-targeted for the consecutive goals and seeded with
+        greedy committees; with more than one process the two are solved
+        concurrently"""
+        profile = as_profile(self.voters, self.candidatesNr)
+        self.avgApp = float(profile.approvals_count) / self.votersNr
+        tasks = [
+            (self.candidates, profile, self.committeeSize, requireJR)
+            for requireJR in (False, True)
+        ]
+        if processes is not None and processes > 1:
+            with resources.budgeted_pool(min(processes, len(tasks))) as pool:
+                values, jr_values = pool.map(resources.Budgeted(_optimal_values), tasks)
+        else:
+            values, jr_values = map(_optimal_values, tasks)
+        self.maxApp = values[APPROVAL_MAX]
+        self.minApp = values[APPROVAL_MIN]
+        self.maxCov = values[COVERAGE_MAX]
+        self.minCov = values[COVERAGE_MIN]
+        self.maxJRApp = jr_values[APPROVAL_MAX]
+        self.minJRApp = jr_values[APPROVAL_MIN]
+        self.maxJRCov = jr_values[COVERAGE_MAX]
+        self.minJRCov = jr_values[COVERAGE_MIN]
+        self.justifiedCore = jr_values[CORE_MIN]
@@ -27,9 +27,11 @@ import core.mylog
 
 logger = core.mylog.get_logger()
 import core.cfg as cfg
+import core.backends as backends
 import argparse
 import random
 import pathlib
+import numpy as np
 import rules
 from distribs import (
     OneDDistribution,
@@ -38,6 +40,7 @@ from distribs import (
     GaussianMixture1D,
 )
 import isxJRChecker as xjrcheck
+from elections import as_profile
 import discore
 import distribs
 from tqdm import tqdm
@@ -120,18 +123,11 @@ def run_experiments(out_name, args):
     logger.info(f"Mesh resolution (coverage x approval score): " f"{resolution}")
     logger.info(f"Distribution: {distribution.get_short_description()}, Seed: {seed}")
 
-    voters = election.votes
-    candidates = election.candidates
-    V = []
-    app = 0
-    for voter in voters:
-        binary_repr = voter.get_binary_representation(candidates)
-        V.append(binary_repr)
-        app += sum(binary_repr)
+    profile = election.profile
 
     heat_data = sampling(
-        V,
-        app,
+        profile,
+        profile.approvals_count,
         approval_score_resolution,
         coverage_resolution,
         committee_size,
@@ -149,29 +145,19 @@ def save_heatmap(MAP, outfile):
 
 
 def avScore(V, W):
-    score = 0
-    for v in V:
-        for c in W:
-            score += v[c]
-    return score
+    return int(as_profile(V).support_counts[list(W)].sum())
 
 
 def ccScore(V, W):
-    score = 0
-    for v in V:
-        add_score = 0
-        for c in W:
-            if v[c] == 1:
-                add_score = 1
-        score += add_score
-    return score
+    return int(as_profile(V).matrix[:, list(W)].any(axis=1).sum())
 
 
 def sampling(V, app, max_approval, max_coverage, k, trials):
     MAP = [[0 for _ in range(max_approval + 1)] for i in range(max_coverage + 1)]
 
-    n = len(V)
-    m = len(range(len(V[0])))
+    V = as_profile(V)
+    n = V.voters_count
+    m = V.candidates_count
 
     logger.info(f"AVG APPROVAL: {float(app)/(n)}")
     EXP = trials
@@ -180,22 +166,25 @@ def sampling(V, app, max_approval, max_coverage, k, trials):
 
     counter = 0
     of_which_ejr = 0
+    ejr_verifier = xjrcheck.XJRVerifier(V, k, xjrcheck.EJR)
+    committees = np.array([random.sample(range(m), k) for _ in range(EXP)])
+    jr_flags, cc_scores = xjrcheck.isJR_batch(V, committees)
+    av_scores = V.support_counts[committees].sum(axis=1)
     for x in tqdm(range(EXP)):
         if x % 1000 == 0:
             logger.info(x)
 
-        W = random.sample(range(m), k)
-        if not xjrcheck.isJR(V, W):
+        if not jr_flags[x]:
             continue
         counter += 1
 
-        av = avScore(V, W)
-        cc = ccScore(V, W)
+        av = av_scores[x]
+        cc = cc_scores[x]
         #    try:
         MAP[cc][av] += 1
         #    except IndexError:
         #      pass
-        if xjrcheck.isEJR_ilp(V, W, len(W)):
+        if ejr_verifier.check(committees[x].tolist())[0]:
             of_which_ejr += 1
     print(f"Found {counter} JR committees of which {of_which_ejr} are EJR")
     return MAP
@@ -274,12 +263,21 @@ def getArgumentsParser():
         help="Pabulib source distribution",
         type=pathlib.PurePath,
     )
+    ap.add_argument(
+        "-mb",
+        "--milp_backend",
+        required=False,
+        default=cfg.milp_backend,
+        choices=backends.BACKENDS,
+        help="MILP backend solving the xJR verification models",
+    )
     return ap
 
 
 if __name__ == "__main__":
     args = getArgumentsParser().parse_args()
     cfg.is_verbose = args.verbose
+    cfg.milp_backend = args.milp_backend
     out_file = args.outFile
     logger.setLevel(args.logLevel)
     run_experiments(out_file, args)
@@ -27,6 +27,7 @@ import core.mylog
 
 logger = core.mylog.get_logger()
 import core.cfg as cfg
+import core.backends as backends
 import argparse
 import random
 from tools.tools import Mesh2, CellsFeatures
@@ -111,7 +112,7 @@ def run_experiments(out_dir, out_name, args):
         election = distribution[0].generate(candidates, votersnr)
         distribution = distribution[0]
 
-    voters = election.votes
+    voters = election.profile
     candidates = election.candidates
     candidatesnr = len(candidates)
     # We need to make candidates a range object
@@ -278,12 +279,39 @@ def getArgumentsParser():
         help="Set of rules to apply",
         choices=["PAV", "PHR", "xJR"],
     )
+    ap.add_argument(
+        "-xp",
+        "--xjr_check_processes",
+        required=False,
+        help="Processes solving the per-ell ILPs of a single EJR/PJR check",
+        type=int,
+    )
+    ap.add_argument(
+        "-mb",
+        "--milp_backend",
+        required=False,
+        default=cfg.milp_backend,
+        choices=backends.BACKENDS,
+        help="MILP backend solving the xJR verification models; the committee "
+        "searches always use Gurobi (see core.baseProgram)",
+    )
+    ap.add_argument(
+        "-lc",
+        "--lc_cache",
+        required=False,
+        default=cfg.lc_cache_path,
+        help="SQLite file caching the large cohesive groups analyses of "
+        "elections across runs",
+    )
     return ap
 
 
 if __name__ == "__main__":
     args = getArgumentsParser().parse_args()
     cfg.is_verbose = args.verbose
+    cfg.milp_backend = args.milp_backend
+    cfg.xjr_check_processes = args.xjr_check_processes
+    cfg.lc_cache_path = args.lc_cache
     outDir = args.outDir
     out_file = args.outFile
     logger.setLevel(args.logLevel)
@@ -25,10 +25,59 @@
 
 from pulp import *
 import math
+import itertools
+import multiprocessing as mproc
+import numpy as np
+import networkx as nx
 import core.mylog as mylog
+import core.backends as backends
+import core.cfg as cfg
+import core.resources as resources
+import presolve
+from elections import ApprovalProfile, as_profile
 
 logger = mylog.get_logger()
 
+# Up to this ell, EJR/PJR are verified by a direct search over supporter bitsets
+# instead of an ILP (see isEJR and isPJR)
+COMBINATORIAL_MAX_ELL = 3
+
+# Cohesiveness of the selected voters (and joint representation for PJR) is
+# either expressed by one constraint per voter-candidate pair or by one
+# aggregated constraint per candidate
+PAIRWISE_FORMULATION = "pairwise"
+AGGREGATED_FORMULATION = "aggregated"
+COHESIVENESS_FORMULATION = PAIRWISE_FORMULATION
+
+
+def _as_rows(V):
+    """Profiles are expanded to (cached) 0/1 rows for the ILP builders"""
+    return V.binary_lists() if isinstance(V, ApprovalProfile) else V
+
+
+def _weighted_rows(V):
+    """The ILP checkers work on weighted voters: returns the 0/1 rows of the
+    distinct ballots of V, their weights and the voters casting each of them
+    (see elections.ApprovalProfile.ballot_types)"""
+    ballots, weights, voters_of_ballot = as_profile(V).ballot_types()
+    return (ballots.binary_lists(), weights.tolist(), voters_of_ballot)
+
+
+def _unit_weights(V, weights):
+    return [1] * len(V) if weights is None else weights
+
+
+def _voter_variables(V, weights):
+    """Selection of the voters of a group; a weighted voter (see
+    _weighted_rows) has an integer variable counting the selected voters
+    casting its ballot"""
+    if weights is None:
+        return [LpVariable("x%d" % i, cat="Binary") for i in range(len(V))]
+    return [
+        LpVariable("x%d" % i, lowBound=0, upBound=weights[i], cat="Integer")
+        for i in range(len(V))
+    ]
+
 
 def appListToBinaryVector(voter, candidates):
     v = [1 if c in voter else 0 for c in candidates]
@@ -60,9 +109,60 @@ def removeVoters(V, c):
     return Vnew
 
 
-def baseXJR_ilp(V, ell, k, available_candidates=None):
+def _resolve_formulation(formulation):
+    if formulation is None:
+        formulation = COHESIVENESS_FORMULATION
+    if formulation not in (PAIRWISE_FORMULATION, AGGREGATED_FORMULATION):
+        raise ValueError(f"Unknown cohesiveness formulation: {formulation}")
+    return formulation
+
+
+def _cohesiveness_constraints(
+    V, X, Y, group_size_bound, formulation=None, weights=None
+):
+    """Constraints ensuring that all chosen candidates are approved by all
+    selected voters; group_size_bound is the largest possible number of the
+    selected voters"""
     n = len(V)
     m = len(V[0])
+    weights = _unit_weights(V, weights)
+    if _resolve_formulation(formulation) == PAIRWISE_FORMULATION:
+        for i in range(n):
+            for j in range(m):
+                yield X[i] <= weights[i] * (V[i][j] + 1 - Y[j])
+        return
+    for j in range(m):
+        non_approvers = [i for i in range(n) if V[i][j] == 0]
+        if not non_approvers:
+            continue
+        big_m = min(sum(weights[i] for i in non_approvers), group_size_bound)
+        yield lpSum(X[i] for i in non_approvers) <= big_m * (1 - Y[j])
+
+
+def _joint_representation_constraints(
+    V, X, W, WW, group_size_bound, formulation=None, weights=None
+):
+    """Constraints setting WW[j] if and only if some selected voter approves
+    W[j]"""
+    n = len(V)
+    weights = _unit_weights(V, weights)
+    for j in range(len(W)):
+        approvers = [i for i in range(n) if V[i][W[j]] == 1]
+        if _resolve_formulation(formulation) == PAIRWISE_FORMULATION:
+            for i in approvers:
+                yield weights[i] * WW[j] >= X[i]
+        elif approvers:
+            big_m = min(sum(weights[i] for i in approvers), group_size_bound)
+            yield lpSum(X[i] for i in approvers) <= big_m * WW[j]
+        yield WW[j] <= lpSum(X[i] for i in approvers)
+
+
+def baseXJR_ilp(V, ell, k, available_candidates=None, formulation=None, weights=None):
+    """With weights, V lists distinct ballots and weights[i] voters cast V[i]
+    (see _weighted_rows); X then counts the selected voters of each ballot"""
+    V = _as_rows(V)
+    n = len(V) if weights is None else sum(weights)
+    m = len(V[0])
 
     noverk = n / k
     ### BELOW: there is indeed problem with division
@@ -73,7 +173,7 @@ def baseXJR_ilp(V, ell, k, available_candidates=None):
 
     model = LpProblem("EJR", LpMinimize)
 
-    X = [LpVariable("x%d" % i, cat="Binary") for i in range(n)]
+    X = _voter_variables(V, weights)
     Y = [LpVariable("y%d" % j, cat="Binary") for j in range(m)]
 
     if available_candidates:
@@ -88,73 +188,71 @@ def baseXJR_ilp(V, ell, k, available_candidates=None):
     model += lpSum(Y) == ell
 
     # ensure all chosen candidates are approved by all selected voters
-    for i in range(n):
-        for j in range(m):
-            model += Y[j] <= V[i][j] + (1 - X[i])
+    for constraint in _cohesiveness_constraints(
+        V, X, Y, math.ceil(ell * noverk), formulation, weights
+    ):
+        model += constraint
 
     return (model, X, Y)
 
 
-def pjr_ilp(V, W, ell, k, available_candidates=None):
-    n = len(V)
-    (model, X, Y) = baseXJR_ilp(V, ell, k, available_candidates)
+def pjr_ilp(V, W, ell, k, available_candidates=None, formulation=None, weights=None):
+    V = _as_rows(V)
+    n = len(V) if weights is None else sum(weights)
+    (model, X, Y) = baseXJR_ilp(V, ell, k, available_candidates, formulation, weights)
     # logger.info(f"k: {k}  ell: {ell}  size(W): {len(W)}")
     WW = [LpVariable("w%d" % j, cat="Binary") for j in range(len(W))]
 
-    for j in range(len(W)):
-        for i in range(n):
-            model += WW[j] >= X[i] * V[i][W[j]]
-        model += WW[j] <= lpSum([X[i] * V[i][W[j]] for i in range(n)])
+    for constraint in _joint_representation_constraints(
+        V, X, W, WW, _largeness_threshold(ell, n, k), formulation, weights
+    ):
+        model += constraint
 
     model += lpSum(WW) <= ell - 1
 
     return (model, X, Y)
 
 
-def isPJR_ilp(V, W, k, available_candidates=None):
+def isPJR_ilp(V, W, k, available_candidates=None, formulation=None):
     # logger.debug(f"PJR ILP, available candidates: {available_candidates}")
-    n = len(V)
+    V, weights, voters_of_ballot = _weighted_rows(V)
     for ell in range(2, k + 1):
-        (model, X, Y) = pjr_ilp(V, W, ell, k, available_candidates)
-        model.solve(GUROBI(msg=0))
+        (model, X, Y) = pjr_ilp(V, W, ell, k, available_candidates, formulation, weights)
+        model.solve(backends.get_solver())
         if model.status == 1:
-            unhappy_group = []
-            for i in range(n):
-                if X[i].value() > 0:
-                    unhappy_group.append(i)
+            unhappy_group = _unhappy_group_of_solved(model, X, voters_of_ballot)
             return (False, unhappy_group, ell)
     return True
 
 
-def ejr_ilp(V, W, ell, k, available_candidates=None):
-    n = len(V)
-    m = len(V[0])
-    (model, X, Y) = baseXJR_ilp(V, ell, k, available_candidates)
+def ejr_ilp(V, W, ell, k, available_candidates=None, formulation=None, weights=None):
+    V = _as_rows(V)
+    (model, X, Y) = baseXJR_ilp(V, ell, k, available_candidates, formulation, weights)
 
-    for i in range(n):
+    for i in range(len(V)):
         approved = 0
         for j in W:
             approved += V[i][j]
-        model += m * (1 - X[i]) >= approved - ell + 1
+        # voters with ell representatives cannot be in an unhappy group
+        if approved >= ell:
+            model += X[i] == 0
 
     return (model, X, Y)
 
 
-def isEJR_ilp(V, W, k, available_candidates=None):
+def isEJR_ilp(V, W, k, available_candidates=None, formulation=None):
     # logger.debug(f"EJR ILP, available candidates: {available_candidates}")
+    V, weights, voters_of_ballot = _weighted_rows(V)
     n = len(V)
 
     for ell in range(1, k + 1):
         #    print "Testing EJR", ell
-        (model, X, Y) = ejr_ilp(V, W, ell, k, available_candidates)
-        model.solve(GUROBI(msg=0))
+        (model, X, Y) = ejr_ilp(V, W, ell, k, available_candidates, formulation, weights)
+        model.solve(backends.get_solver())
         if model.status == 1:
             #      print "NO EJR"
 
-            unhappy_group = []
-            for i in range(n):
-                if X[i].value() > 0:
-                    unhappy_group.append(i)
+            unhappy_group = _unhappy_group_of_solved(model, X, voters_of_ballot)
 
             return (
                 False,
@@ -195,32 +293,793 @@ def isEJR_ilp(V, W, k, available_candidates=None):
     return (True, [], 0)
 
 
+def baseXJR_all_ells_ilp(
+    V, ells, k, available_candidates=None, formulation=None, weights=None
+):
+    """Like baseXJR_ilp but with ell being a decision: exactly one of the
+    binary variables in Z (indexed by the values in ells) is set and the
+    number of selected voters and witnessing candidates follow it"""
+    V = _as_rows(V)
+    n = len(V) if weights is None else sum(weights)
+    m = len(V[0])
+
+    model = LpProblem("xJR_all_ells", LpMinimize)
+
+    X = _voter_variables(V, weights)
+    Y = [LpVariable("y%d" % j, cat="Binary") for j in range(m)]
+    Z = {ell: LpVariable("z%d" % ell, cat="Binary") for ell in ells}
+
+    if available_candidates:
+        for cand in range(m):
+            if cand in available_candidates:
+                continue
+            model += Y[cand] == 0
+
+    model += lpSum(Z.values()) == 1
+    ell_expr = lpSum(ell * Z[ell] for ell in ells)
+    # choose ceil(ell*n/k) voters for the selected ell
+    model += lpSum(X) == lpSum(_largeness_threshold(ell, n, k) * Z[ell] for ell in ells)
+    # choose ell candidates that will witness cohesiveness
+    model += lpSum(Y) == ell_expr
+
+    # ensure all chosen candidates are approved by all selected voters
+    for constraint in _cohesiveness_constraints(
+        V, X, Y, _largeness_threshold(max(ells), n, k), formulation, weights
+    ):
+        model += constraint
+
+    return (model, X, Y, Z, ell_expr)
+
+
+def _ejr_representation_constraint(X, Z, i, approved, weight):
+    """Voter (ballot) i with approved representatives can only be selected if
+    the chosen ell exceeds approved"""
+    return X[i] <= weight * lpSum(Z[ell] for ell in Z if ell > approved)
+
+
+def ejr_all_ells_ilp(
+    V, W, ells, k, available_candidates=None, formulation=None, weights=None
+):
+    V = _as_rows(V)
+    (model, X, Y, Z, ell_expr) = baseXJR_all_ells_ilp(
+        V, ells, k, available_candidates, formulation, weights
+    )
+    weights = _unit_weights(V, weights)
+
+    for i in range(len(V)):
+        approved = 0
+        for j in W:
+            approved += V[i][j]
+        if approved == 0:
+            continue
+        model += _ejr_representation_constraint(X, Z, i, approved, weights[i])
+
+    return (model, X, Y, Z)
+
+
+def pjr_all_ells_ilp(
+    V, W, ells, k, available_candidates=None, formulation=None, weights=None
+):
+    V = _as_rows(V)
+    n = len(V) if weights is None else sum(weights)
+    (model, X, Y, Z, ell_expr) = baseXJR_all_ells_ilp(
+        V, ells, k, available_candidates, formulation, weights
+    )
+    WW = [LpVariable("w%d" % j, cat="Binary") for j in range(len(W))]
+
+    for constraint in _joint_representation_constraints(
+        V, X, W, WW, _largeness_threshold(max(ells), n, k), formulation, weights
+    ):
+        model += constraint
+
+    model += lpSum(WW) <= ell_expr - 1
+
+    return (model, X, Y, Z)
+
+
+def _solve_all_ells(builder, V, W, ells, k, available_candidates, formulation=None):
+    """Returns (False, unhappy_group, ell) for a violating ell found by a
+    single solve over all ells; (True, [], 0) if there is none"""
+    ells = list(ells)
+    if not ells:
+        return (True, [], 0)
+    V, weights, voters_of_ballot = _weighted_rows(V)
+    (model, X, Y, Z) = builder(
+        V, list(W), ells, k, available_candidates, formulation, weights
+    )
+    model.solve(backends.get_solver())
+    unhappy_group = _unhappy_group_of_solved(model, X, voters_of_ballot)
+    if unhappy_group is None:
+        return (True, [], 0)
+    failing_ell = next(ell for ell in ells if Z[ell].value() > 0.5)
+    return (False, unhappy_group, failing_ell)
+
+
+def isEJR_single_ilp(V, W, k, available_candidates=None, formulation=None):
+    """EJR check by one ILP for all ell; returns (True, [], 0) or
+    (False, unhappy_group, ell)"""
+    return _solve_all_ells(
+        ejr_all_ells_ilp,
+        V,
+        W,
+        range(1, k + 1),
+        k,
+        available_candidates,
+        formulation,
+    )
+
+
+def isPJR_single_ilp(V, W, k, available_candidates=None, formulation=None):
+    """PJR check by one ILP for all ell; returns (True, [], 0) or
+    (False, unhappy_group, ell)"""
+    return _solve_all_ells(
+        pjr_all_ells_ilp,
+        V,
+        W,
+        range(2, k + 1),
+        k,
+        available_candidates,
+        formulation,
+    )
+
+
+def _largeness_threshold(ell, n, k):
+    return -(-ell * n // k)
+
+
+def _find_cohesive_group(profile, eligible_bits, ell, threshold, candidates):
+    """Searches for ell candidates approved by at least threshold of the
+    eligible voters (given as a packed row). Returns the packed row of all
+    eligible voters approving the found candidates or None. Supporter sets only
+    shrink as candidates are added, so only candidates that are themselves
+    approved by enough eligible voters are considered and every partial set
+    that is already too weakly supported is abandoned"""
+    viable = []
+    for cand in candidates:
+        cand_bits = profile.candidate_bits[cand] & eligible_bits
+        if profile.count_bits(cand_bits) >= threshold:
+            viable.append(cand_bits)
+    if len(viable) < ell:
+        return None
+
+    def extend(first_index, group_bits, chosen):
+        if chosen == ell:
+            return group_bits
+        for index in range(first_index, len(viable) - (ell - chosen) + 1):
+            new_group_bits = group_bits & viable[index]
+            if profile.count_bits(new_group_bits) < threshold:
+                continue
+            found = extend(index + 1, new_group_bits, chosen + 1)
+            if found is not None:
+                return found
+        return None
+
+    return extend(0, eligible_bits, 0)
+
+
+def _witness_candidates(profile, available_candidates):
+    if available_candidates:
+        return sorted(available_candidates)
+    return range(profile.candidates_count)
+
+
+def _witness_group(profile, group_bits, threshold):
+    return profile.unpack_voters(group_bits)[:threshold]
+
+
+def ejr_violation_combinatorial(V, W, ell, k, available_candidates=None):
+    """Returns a group of ceil(ell*n/k) voters that approve ell common
+    candidates and each approve fewer than ell members of W; None if there is
+    no such group"""
+    profile = as_profile(V)
+    threshold = _largeness_threshold(ell, profile.voters_count, k)
+    represented = profile.matrix[:, list(W)].sum(axis=1)
+    eligible_bits = np.packbits(represented < ell)
+    group_bits = _find_cohesive_group(
+        profile,
+        eligible_bits,
+        ell,
+        threshold,
+        _witness_candidates(profile, available_candidates),
+    )
+    if group_bits is None:
+        return None
+    return _witness_group(profile, group_bits, threshold)
+
+
+def pjr_violation_combinatorial(V, W, ell, k, available_candidates=None):
+    """Returns a group of ceil(ell*n/k) voters that approve ell common
+    candidates and jointly approve fewer than ell members of W; None if there
+    is no such group. Every subset U of W of size ell-1 is tried as the joint
+    representation of the group, so the eligible voters are those approving
+    nobody in W outside U"""
+    profile = as_profile(V)
+    threshold = _largeness_threshold(ell, profile.voters_count, k)
+    candidates = _witness_candidates(profile, available_candidates)
+    W = list(W)
+    all_voters = np.packbits(np.ones(profile.voters_count, dtype=bool))
+    for represented in itertools.combinations(W, min(ell - 1, len(W))):
+        unrepresented = [c for c in W if c not in represented]
+        eligible_bits = all_voters
+        if unrepresented:
+            eligible_bits = all_voters & ~np.bitwise_or.reduce(
+                profile.candidate_bits[unrepresented], axis=0
+            )
+        group_bits = _find_cohesive_group(
+            profile, eligible_bits, ell, threshold, candidates
+        )
+        if group_bits is not None:
+            return _witness_group(profile, group_bits, threshold)
+    return None
+
+
+def _unhappy_group_of_solved(model, X, voters_of_ballot=None):
+    """Selected voters of a solved model; with voters_of_ballot, X counts the
+    selected voters of each ballot (see _weighted_rows)"""
+    if model.status != 1:
+        return None
+    if voters_of_ballot is None:
+        return [i for i in range(len(X)) if X[i].value() > 0]
+    unhappy_group = []
+    for i, voters in enumerate(voters_of_ballot):
+        unhappy_group.extend(voters[: int(round(X[i].value()))])
+    return unhappy_group
+
+
+EJR = "EJR"
+PJR = "PJR"
+
+
+def ejr_plus_violation(V, W, k):
+    """Returns (group, ell) such that the group has at least ell*n/k voters,
+    each approving fewer than ell members of W and all approving a common
+    candidate outside W; None if W satisfies EJR+ (which implies EJR)"""
+    profile = as_profile(V)
+    n = profile.voters_count
+    W = list(W)
+    outside = np.ones(profile.candidates_count, dtype=bool)
+    outside[W] = False
+    represented = profile.matrix[:, W].sum(axis=1)
+    for ell in range(1, k + 1):
+        underrepresented = represented < ell
+        if np.count_nonzero(underrepresented) * k < ell * n:
+            continue
+        support = np.count_nonzero(profile.matrix[underrepresented], axis=0)
+        violating = np.flatnonzero(outside & (support * k >= ell * n))
+        if violating.size > 0:
+            cand = violating[0]
+            group = np.flatnonzero(underrepresented & profile.matrix[:, cand])
+            return (group.tolist(), ell)
+    return None
+
+
+def pjr_plus_violation(V, W, k):
+    """Returns (group, ell) such that the group has at least ell*n/k voters,
+    jointly approving fewer than ell members of W and all approving a common
+    candidate outside W; None if W satisfies PJR+ (which implies PJR).
+
+    For a candidate c outside W, picking the supporters of c and the union T
+    of their approvals in W is a maximum weight closure problem (a voter is
+    worth k, a member of W costs n), solved by a minimum cut; a violation
+    exists iff some closure is worth at least n, i.e., iff k*|group| >=
+    (|T| + 1)*n"""
+    profile = as_profile(V)
+    if ejr_plus_violation(profile, W, k) is None:
+        return None
+    n = profile.voters_count
+    W = list(W)
+    for cand in range(profile.candidates_count):
+        if cand in W or profile.support_counts[cand] * k < n:
+            continue
+        supporters = np.flatnonzero(profile.matrix[:, cand])
+        # supporters with the same approvals in W share a node
+        patterns, pattern_of_supporter, pattern_counts = np.unique(
+            profile.matrix[np.ix_(supporters, W)],
+            axis=0,
+            return_inverse=True,
+            return_counts=True,
+        )
+        graph = nx.DiGraph()
+        for p, pattern in enumerate(patterns):
+            graph.add_edge("source", ("voters", p), capacity=k * int(pattern_counts[p]))
+            for j in np.flatnonzero(pattern):
+                graph.add_edge(("voters", p), ("member", j))
+        for j in range(len(W)):
+            graph.add_edge(("member", j), "sink", capacity=n)
+        cut_value, (closure, _) = nx.minimum_cut(graph, "source", "sink")
+        if k * len(supporters) - cut_value < n:
+            continue
+        members_count = sum(1 for node in closure if node[0] == "member")
+        in_closure = np.array(
+            [("voters", p) in closure for p in range(len(patterns))], dtype=bool
+        )
+        group = supporters[in_closure[np.ravel(pattern_of_supporter)]]
+        return (group.tolist(), members_count + 1)
+    return None
+
+
+def isEJR_plus(V, W, k):
+    """EJR+ check; returns (True, [], 0) or (False, group, ell) where the group
+    witnesses the EJR+ violation (not necessarily an EJR one)"""
+    violation = ejr_plus_violation(V, W, k)
+    if violation is None:
+        return (True, [], 0)
+    group, ell = violation
+    return (False, group, ell)
+
+
+def isPJR_plus(V, W, k):
+    """PJR+ check; returns (True, [], 0) or (False, group, ell) where the group
+    witnesses the PJR+ violation (not necessarily a PJR one)"""
+    violation = pjr_plus_violation(V, W, k)
+    if violation is None:
+        return (True, [], 0)
+    group, ell = violation
+    return (False, group, ell)
+
+
+def ell_violation_likelihoods(V, W, ells, k, lc_analysis=None):
+    """Cheap likelihood of an EJR/PJR violation for each ell: the number of
+    voters approving fewer than ell members of W over the largeness threshold.
+    With lc_analysis (see lcgroups.large_cohesive_groups_analysis) only the
+    voters within one maximal ell-large ell-cohesive group are counted. Every
+    member of a violating group approves fewer than ell members of W, so a
+    likelihood below 1 rules the ell out"""
+    profile = as_profile(V)
+    n = profile.voters_count
+    represented = profile.matrix[:, list(W)].sum(axis=1)
+    likelihoods = {}
+    for ell in ells:
+        threshold = _largeness_threshold(ell, n, k)
+        underrepresented = represented < ell
+        if lc_analysis is None:
+            likelihoods[ell] = np.count_nonzero(underrepresented) / threshold
+            continue
+        groups = lc_analysis["maximal_lc_groups"].get(ell, [])
+        likelihoods[ell] = max(
+            (
+                np.count_nonzero(underrepresented[list(group["voters"])]) / threshold
+                for group in groups
+            ),
+            default=0,
+        )
+    return likelihoods
+
+
+def _ell_violation(task):
+    axiom, V, weights, voters_of_ballot, W, ell, k = task[:7]
+    available_candidates, formulation, backend = task[7:]
+    builder = ejr_ilp if axiom == EJR else pjr_ilp
+    (model, X, Y) = builder(V, W, ell, k, available_candidates, formulation, weights)
+    model.solve(backends.get_solver(backend))
+    return (ell, _unhappy_group_of_solved(model, X, voters_of_ballot))
+
+
+def parallel_violation_check(
+    V,
+    W,
+    k,
+    axiom,
+    ells=None,
+    available_candidates=None,
+    formulation=None,
+    processes=None,
+    lc_analysis=None,
+    backend=None,
+):
+    """Solves the per-ell ILPs in a pool of processes, the most likely
+    violated ell first (see ell_violation_likelihoods; the ruled out ones are
+    skipped), and terminates the remaining solves as soon as one finds an
+    unhappy group. Returns (True, [], 0) or (False, unhappy_group, ell); the
+    reported ell is the first found, not necessarily the smallest one"""
+    profile = as_profile(V)
+    W = list(W)
+    if ells is None:
+        ells = range(1 if axiom == EJR else 2, k + 1)
+    likelihoods = ell_violation_likelihoods(profile, W, ells, k, lc_analysis)
+    ells = sorted(
+        (ell for ell in ells if likelihoods[ell] >= 1),
+        key=lambda ell: likelihoods[ell],
+        reverse=True,
+    )
+    if not ells:
+        return (True, [], 0)
+    if backend is None:
+        backend = cfg.milp_backend
+    rows, weights, voters_of_ballot = _weighted_rows(profile)
+    tasks = [
+        (
+            axiom,
+            rows,
+            weights,
+            voters_of_ballot,
+            W,
+            ell,
+            k,
+            available_candidates,
+            formulation,
+            backend,
+        )
+        for ell in ells
+    ]
+    pool = resources.budgeted_pool(min(processes or mproc.cpu_count(), len(tasks)))
+    try:
+        for ell, unhappy_group in pool.imap_unordered(
+            resources.Budgeted(_ell_violation), tasks
+        ):
+            if unhappy_group is not None:
+                return (False, unhappy_group, ell)
+        return (True, [], 0)
+    finally:
+        pool.terminate()
+
+
+def isEJR_parallel(
+    V, W, k, available_candidates=None, processes=None, lc_analysis=None
+):
+    """EJR check solving the per-ell ILPs in parallel, see
+    parallel_violation_check"""
+    return parallel_violation_check(
+        V,
+        W,
+        k,
+        EJR,
+        available_candidates=available_candidates,
+        processes=processes,
+        lc_analysis=lc_analysis,
+    )
+
+
+def isPJR_parallel(
+    V, W, k, available_candidates=None, processes=None, lc_analysis=None
+):
+    """PJR check solving the per-ell ILPs in parallel, see
+    parallel_violation_check"""
+    return parallel_violation_check(
+        V,
+        W,
+        k,
+        PJR,
+        available_candidates=available_candidates,
+        processes=processes,
+        lc_analysis=lc_analysis,
+    )
+
+
+class ViolationWitnesses(object):
+    """Unhappy groups (with their ell) found for one election, committee size
+    and axiom. The cohesiveness and the size of such a group do not depend on
+    the committee, so a committee is rejected right away if it leaves any of
+    the stored groups unhappy; checking all witnesses of one ell takes a few
+    operations on the stacked voter bitsets"""
+
+    def __init__(self, profile, axiom):
+        if axiom not in (EJR, PJR):
+            raise ValueError(f"Unknown axiom to verify: {axiom}")
+        self._profile = profile
+        self._axiom = axiom
+        self._groups = {}
+        self._packed_groups = {}
+        self._stacked_groups = {}
+        self._known = set()
+
+    def __len__(self):
+        return len(self._known)
+
+    def add(self, group, ell):
+        packed_group = self._profile.voters_mask(group)
+        key = (ell, packed_group.tobytes())
+        if key in self._known:
+            return
+        self._known.add(key)
+        self._groups.setdefault(ell, []).append(list(group))
+        self._packed_groups.setdefault(ell, []).append(packed_group)
+        self._stacked_groups.pop(ell, None)
+
+    def find(self, W):
+        """Returns (unhappy_group, ell) of a stored witness that W violates
+        (with the smallest ell) or None"""
+        W = list(W)
+        if self._axiom == EJR:
+            represented = self._profile.matrix[:, W].sum(axis=1)
+        for ell in sorted(self._groups):
+            groups = self._stacked(ell)
+            if self._axiom == EJR:
+                # no voter of the group has ell representatives in W
+                satisfied = np.packbits(represented >= ell)
+                unhappy = ~(groups & satisfied).any(axis=1)
+            else:
+                # the group jointly approves fewer than ell members of W
+                jointly_approved = np.zeros(len(groups), dtype=np.intp)
+                for cand in W:
+                    jointly_approved += (
+                        groups & self._profile.candidate_bits[cand]
+                    ).any(axis=1)
+                unhappy = jointly_approved < ell
+            violated = np.flatnonzero(unhappy)
+            if violated.size > 0:
+                return (list(self._groups[ell][violated[0]]), ell)
+        return None
+
+    def _stacked(self, ell):
+        if ell not in self._stacked_groups:
+            self._stacked_groups[ell] = np.vstack(self._packed_groups[ell])
+        return self._stacked_groups[ell]
+
+
+class XJRVerifier(object):
+    """EJR or PJR verifier for a fixed election and committee size k, meant
+    for checking many committees. Small ell are verified combinatorially (see
+    COMBINATORIAL_MAX_ELL) and all the remaining ones by a single ILP over all
+    ell. The ILP part that only depends on the voters (choice of ell, of the
+    group and of the witnessing candidates and the cohesiveness constraints) is
+    built once; between checks only the constraints depending on the committee
+    are swapped. The ILP is solved by the given MILP backend (see
+    core.backends), cfg.milp_backend by default. Unless use_witnesses is
+    False, all found violations are kept in ViolationWitnesses and every
+    committee is first tested against them. With plus_screening, committees
+    satisfying EJR+ (PJR+), which implies EJR (PJR), are accepted without
+    the exact check. With more than one process (processes, by default
+    cfg.xjr_check_processes) the ILP part is replaced by per-ell ILPs solved
+    in parallel, see parallel_violation_check. The witnessing candidates are
+    restricted to those left by the dominance presolve (see
+    presolve.undominated_candidates) among the available ones"""
+
+    _COMMITTEE_CONSTRAINT_PREFIX = "committee_"
+
+    def __init__(
+        self,
+        V,
+        k,
+        axiom,
+        available_candidates=None,
+        max_combinatorial_ell=None,
+        formulation=None,
+        backend=None,
+        use_witnesses=True,
+        plus_screening=False,
+        processes=None,
+        lc_analysis=None,
+    ):
+        if axiom not in (EJR, PJR):
+            raise ValueError(f"Unknown axiom to verify: {axiom}")
+        if max_combinatorial_ell is None:
+            max_combinatorial_ell = COMBINATORIAL_MAX_ELL
+        self._profile = as_profile(V)
+        self._k = k
+        self._axiom = axiom
+        self._available_candidates = presolve.undominated_candidates(
+            self._profile, k, available_candidates or None
+        )
+        self._formulation = _resolve_formulation(formulation)
+        self._backend = backend
+        self._plus_screening = plus_screening
+        if processes is None:
+            processes = cfg.xjr_check_processes
+        self._processes = processes
+        self._lc_analysis = lc_analysis
+        self._witnesses = (
+            ViolationWitnesses(self._profile, axiom) if use_witnesses else None
+        )
+        first_ell = 1 if axiom == EJR else 2
+        self._combinatorial_ells = range(first_ell, min(k, max_combinatorial_ell) + 1)
+        self._ilp_ells = list(range(max(first_ell, max_combinatorial_ell + 1), k + 1))
+        self._ballots, self._weights, self._voters_of_ballot = _weighted_rows(
+            self._profile
+        )
+        self._model = None
+        self._committee_constraints = []
+        self._committee_vars = []
+
+    @property
+    def profile(self):
+        return self._profile
+
+    @property
+    def committee_size(self):
+        return self._k
+
+    @property
+    def witnesses(self):
+        return self._witnesses
+
+    def check(self, W):
+        """Returns (True, [], 0) if W satisfies the axiom and
+        (False, unhappy_group, ell) otherwise"""
+        W = list(W)
+        if self._witnesses is not None:
+            witness = self._witnesses.find(W)
+            if witness is not None:
+                unhappy_group, ell = witness
+                return (False, unhappy_group, ell)
+        if self._plus_screening and self._satisfies_plus(W):
+            return (True, [], 0)
+        result = self._check_without_witnesses(W)
+        if not result[0] and self._witnesses is not None:
+            self._witnesses.add(result[1], result[2])
+        return result
+
+    def _satisfies_plus(self, W):
+        if self._axiom == EJR:
+            return ejr_plus_violation(self._profile, W, self._k) is None
+        return pjr_plus_violation(self._profile, W, self._k) is None
+
+    def _check_without_witnesses(self, W):
+        combinatorial_checker = (
+            ejr_violation_combinatorial
+            if self._axiom == EJR
+            else pjr_violation_combinatorial
+        )
+        for ell in self._combinatorial_ells:
+            unhappy_group = combinatorial_checker(
+                self._profile, W, ell, self._k, self._available_candidates
+            )
+            if unhappy_group is not None:
+                return (False, unhappy_group, ell)
+        if not self._ilp_ells:
+            return (True, [], 0)
+        if self._processes is not None and self._processes > 1:
+            return parallel_violation_check(
+                self._profile,
+                W,
+                self._k,
+                self._axiom,
+                self._ilp_ells,
+                self._available_candidates,
+                self._formulation,
+                self._processes,
+                self._lc_analysis,
+                self._backend,
+            )
+        if self._model is None:
+            self._build_base_model()
+        self._set_committee(W)
+        self._model.solve(backends.get_solver(self._backend))
+        unhappy_group = _unhappy_group_of_solved(
+            self._model, self._X, self._voters_of_ballot
+        )
+        if unhappy_group is None:
+            return (True, [], 0)
+        failing_ell = next(ell for ell in self._ilp_ells if self._Z[ell].value() > 0.5)
+        return (False, unhappy_group, failing_ell)
+
+    def _build_base_model(self):
+        self._model, self._X, self._Y, self._Z, self._ell_expr = baseXJR_all_ells_ilp(
+            self._ballots,
+            self._ilp_ells,
+            self._k,
+            self._available_candidates,
+            self._formulation,
+            self._weights,
+        )
+
+    def _add_committee_constraint(self, constraint):
+        name = f"{self._COMMITTEE_CONSTRAINT_PREFIX}{len(self._committee_constraints)}"
+        self._model += constraint, name
+        self._committee_constraints.append(name)
+
+    def _set_committee(self, W):
+        for name in self._committee_constraints:
+            del self._model.constraints[name]
+        self._committee_constraints = []
+        X = self._X
+        if self._axiom == EJR:
+            # voters approving nobody in W cannot be EJR-satisfied for any ell
+            represented = [sum(ballot[j] for j in W) for ballot in self._ballots]
+            for i, approved in enumerate(represented):
+                if approved == 0:
+                    continue
+                self._add_committee_constraint(
+                    _ejr_representation_constraint(
+                        X, self._Z, i, approved, self._weights[i]
+                    )
+                )
+        else:
+            while len(self._committee_vars) < len(W):
+                self._committee_vars.append(
+                    LpVariable("w%d" % len(self._committee_vars), cat="Binary")
+                )
+            WW = self._committee_vars[: len(W)]
+            for constraint in _joint_representation_constraints(
+                self._ballots,
+                X,
+                W,
+                WW,
+                _largeness_threshold(
+                    self._ilp_ells[-1], self._profile.voters_count, self._k
+                ),
+                self._formulation,
+                self._weights,
+            ):
+                self._add_committee_constraint(constraint)
+            self._add_committee_constraint(lpSum(WW) <= self._ell_expr - 1)
+
+
+def isEJR(
+    V, W, k, available_candidates=None, max_combinatorial_ell=None, formulation=None
+):
+    """Hybrid EJR verification: for ell up to max_combinatorial_ell (default
+    COMBINATORIAL_MAX_ELL) violations are searched for directly on the
+    supporters bitsets, all larger ell are checked by a single ILP. Returns
+    (True, [], 0) or (False, unhappy_group, ell). Use XJRVerifier to check
+    multiple committees of the same election"""
+    return XJRVerifier(
+        V, k, EJR, available_candidates, max_combinatorial_ell, formulation
+    ).check(W)
+
+
+def isPJR(
+    V, W, k, available_candidates=None, max_combinatorial_ell=None, formulation=None
+):
+    """Hybrid PJR verification, see isEJR. Returns (True, [], 0) or
+    (False, unhappy_group, ell)"""
+    return XJRVerifier(
+        V, k, PJR, available_candidates, max_combinatorial_ell, formulation
+    ).check(W)
+
+
 def isJR(V, W):
-    n = len(V)
+    profile = as_profile(V)
+    n = profile.voters_count
     k = len(W)
-    for c in W:
-        V = removeVoters(V, c)
+    uncovered = ~profile.matrix[:, list(W)].any(axis=1)
 
-    if len(V) == 0:
+    if not uncovered.any():
         return True
 
-    (c, M) = mostPopular(V)
+    M = profile.matrix[uncovered].sum(axis=0).max()
     if M >= float(n) / float(k):
         return False
     return True
 
 
-def xJRChecking(V, W):
+# bound on the number of voter-committee-member entries materialized at once
+# by isJR_batch
+JR_BATCH_ENTRIES = 2**24
+
+
+def isJR_batch(V, committees):
+    """JR check of many committees of the same size at once; committees is a
+    2-D array with one committee per row. Returns a pair of vectors: whether
+    each committee is JR and how many voters it covers (its CC score)"""
+    profile = as_profile(V)
+    committees = np.asarray(committees, dtype=np.intp)
+    if committees.ndim != 2:
+        raise ValueError("Committees have to be given as a 2-D array")
+    n = profile.voters_count
+    trials, k = committees.shape
+    approvals = profile.matrix.astype(np.float32)
+    is_jr = np.ones(trials, dtype=bool)
+    covered_count = np.zeros(trials, dtype=np.intp)
+    chunk = max(1, JR_BATCH_ENTRIES // max(1, n * k))
+    for start in range(0, trials, chunk):
+        W = committees[start : start + chunk]
+        # voters x committees
+        covered = profile.matrix[:, W].any(axis=2)
+        covered_count[start : start + chunk] = covered.sum(axis=0)
+        # committees x candidates: uncovered supporters of each candidate
+        uncovered_support = (~covered).T.astype(np.float32) @ approvals
+        is_jr[start : start + chunk] = uncovered_support.max(axis=1) * k < n
+    return (is_jr, covered_count)
+
+
+def xJRChecking(V, W, plus_screening=False):
     """This functions checks whether a committee is ERJ, PJR, and JR.
     It returns a boolean-valued triplet (JR, EJR, PJR) where an entry
-    is True when the committee meets a respeective xJR"""
+    is True when the committee meets a respeective xJR. With plus_screening,
+    EJR (PJR) is accepted without the exact check when EJR+ (PJR+) holds"""
+    V = as_profile(V)
     JRFlag = isJR(V, W)
     if not JRFlag:
         return (False, False, False)
-    A = isEJR_ilp(V, W, len(W))
+    if plus_screening and ejr_plus_violation(V, W, len(W)) is None:
+        return (True, True, True)
+    A = isEJR(V, W, len(W))[0]
     if A:
         return (True, True, True)
-    A = isPJR_ilp(V, W, len(W))
+    if plus_screening and pjr_plus_violation(V, W, len(W)) is None:
+        return (True, True, False)
+    A = isPJR(V, W, len(W))[0]
     if A:
         return (True, True, False)
     return (True, False, False)
@@ -0,0 +1,146 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Copyright 2025 Andrzej Kaczmarczyk<droodev@gmail.com>
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the “Software”), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+"""Cache of lcgroups.large_cohesive_groups_analysis keyed by the fingerprint
+of the profile (see elections.ApprovalProfile.fingerprint) and the committee
+size. Results live in an in-memory LRU of cfg.lc_cache_size entries per
+process, backed, if cfg.lc_cache_path is set, by an SQLite file shared by
+processes and reruns. Bump ANALYSIS_VERSION whenever the analysis changes so
+that stale on-disk results are ignored"""
+
+import collections
+import pickle
+import sqlite3
+
+import core.cfg as cfg
+import core.mylog as mylog
+import lcgroups
+from elections import as_profile
+
+logger = mylog.get_logger()
+
+ANALYSIS_VERSION = 1
+
+# seconds to wait for another process holding the SQLite file's lock
+DISK_CACHE_TIMEOUT = 60
+
+_memory_cache = collections.OrderedDict()
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=DISK_CACHE_TIMEOUT)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS lc_analysis (fingerprint TEXT, "
+        "comm_size INTEGER, version INTEGER, analysis BLOB, "
+        "PRIMARY KEY (fingerprint, comm_size, version))"
+    )
+    return connection
+
+
+def _load(path, key):
+    connection = _connect(path)
+    try:
+        row = connection.execute(
+            "SELECT analysis FROM lc_analysis WHERE fingerprint = ? AND "
+            "comm_size = ? AND version = ?",
+            key + (ANALYSIS_VERSION,),
+        ).fetchone()
+    finally:
+        connection.close()
+    return None if row is None else pickle.loads(row[0])
+
+
+def _store(path, key, analysis):
+    connection = _connect(path)
+    try:
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO lc_analysis VALUES (?, ?, ?, ?)",
+                key
+                + (
+                    ANALYSIS_VERSION,
+                    pickle.dumps(analysis, protocol=pickle.HIGHEST_PROTOCOL),
+                ),
+            )
+    finally:
+        connection.close()
+
+
+def _remember(key, analysis):
+    _memory_cache[key] = analysis
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > max(cfg.lc_cache_size, 0):
+        _memory_cache.popitem(last=False)
+
+
+def _cached(key):
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+    if not cfg.lc_cache_path:
+        return None
+    analysis = _load(cfg.lc_cache_path, key)
+    if analysis is not None:
+        logger.debug(f"LC group analysis of {key} read from {cfg.lc_cache_path}")
+        _remember(key, analysis)
+    return analysis
+
+
+def _cache(key, analysis):
+    if cfg.lc_cache_path:
+        _store(cfg.lc_cache_path, key, analysis)
+    _remember(key, analysis)
+
+
+def large_cohesive_groups_analysis(election, comm_size):
+    """Cached lcgroups.large_cohesive_groups_analysis; the returned dictionary
+    is shared, do not modify it"""
+    key = (as_profile(election).fingerprint(), comm_size)
+    analysis = _cached(key)
+    if analysis is None:
+        analysis = lcgroups.large_cohesive_groups_analysis(election, comm_size)
+        _cache(key, analysis)
+    return analysis
+
+
+def large_cohesive_groups_analyses(election, comm_sizes):
+    """Cached lcgroups.large_cohesive_groups_analyses; the sizes missing from
+    the cache are analysed in one pass. Keep cfg.lc_cache_size at least the
+    number of sizes for the later per-size lookups to hit the memory"""
+    fingerprint = as_profile(election).fingerprint()
+    analyses = {}
+    for comm_size in comm_sizes:
+        analysis = _cached((fingerprint, comm_size))
+        if analysis is not None:
+            analyses[comm_size] = analysis
+    missing = [comm_size for comm_size in comm_sizes if comm_size not in analyses]
+    for comm_size, analysis in lcgroups.large_cohesive_groups_analyses(
+        election, missing
+    ).items():
+        _cache((fingerprint, comm_size), analysis)
+        analyses[comm_size] = analysis
+    return analyses
+
+
+def clear_memory_cache():
+    _memory_cache.clear()
@@ -25,8 +25,12 @@ import math
 import itertools
 from functools import reduce
 
+import numpy as np
+
 import core.mylog as mylog
 import lcgroups
+import presolve
+from elections import as_profile
 
 logger = mylog.get_logger()
 
@@ -43,66 +47,286 @@ def get_group_approvals_from_voter_obj(supporting_voters):
     return reduce(lambda acc, v: acc | v.approvals, supporting_voters, set())
 
 
-def large_cohesive_groups_analysis(election, comm_size):
+def get_group_approvals_from_sets(supporting_voters, approval_sets):
+    return set().union(*(approval_sets[v] for v in supporting_voters))
+
+
+def large_inducing_sets(profile, candidates, comm_size):
+    """Yields, level by level (ell = 1, 2, ...) and lexicographically within
+    a level, the pairs of an ell-subset of candidates (sorted) approved by at
+    least get_largeness_threshold(ell) voters and the packed row of these
+    voters. Supporters only shrink as candidates are added and the threshold
+    grows with ell, so every subset of a large set is large (at its own level)
+    and, as in Apriori, the sets of a level are the joins of two large sets of
+    the previous level sharing all but the last candidate, all of whose
+    subsets are large. The search stops at the first level with no large set
+    or at comm_size"""
+    level = {}
+    l_thres = get_largeness_threshold(1, profile.voters_count, comm_size)
+    for cand in sorted(candidates):
+        supporters_bits = profile.candidate_bits[cand]
+        if profile.count_bits(supporters_bits) >= l_thres:
+            level[(cand,)] = supporters_bits
+    group_size = 1
+    while level:
+        yield from level.items()
+        if group_size == comm_size:
+            return
+        group_size += 1
+        l_thres = get_largeness_threshold(group_size, profile.voters_count, comm_size)
+        next_level = {}
+        large_sets = list(level)
+        for first_index, first in enumerate(large_sets):
+            for second in large_sets[first_index + 1 :]:
+                if second[:-1] != first[:-1]:
+                    break
+                inducing_cands = first + second[-1:]
+                if any(
+                    inducing_cands[:index] + inducing_cands[index + 1 :] not in level
+                    for index in range(group_size - 2)
+                ):
+                    continue
+                supporters_bits = level[first] & profile.candidate_bits[second[-1]]
+                if profile.count_bits(supporters_bits) >= l_thres:
+                    next_level[inducing_cands] = supporters_bits
+        level = next_level
+
+
+def _group_closure(profile, supporters_bits):
+    """The committee size independent part of a group given as a packed row
+    of its voters: the voters, its maximal inducing set (all candidates its
+    voters approve in common) and the union of their approvals"""
+    voters = profile.unpack_voters(supporters_bits)
+    closure = np.flatnonzero(profile.matrix[voters].all(axis=0)).tolist()
+    approvals = (profile.candidate_bits & supporters_bits).any(axis=1)
+    return (set(voters), tuple(closure), set(np.flatnonzero(approvals).tolist()))
+
+
+def _closed_lc_group(profile, group_closure, comm_size):
+    """The group (see _group_closure) with the largest ell for which it is
+    ell-large and ell-cohesive"""
+    voters, closure, approvals = group_closure
+    ell = min(len(closure), comm_size)
+    while len(voters) < get_largeness_threshold(ell, profile.voters_count, comm_size):
+        ell -= 1
+    return {
+        "voters": voters,
+        "inducing_cands": closure,
+        "approved_by_all_group_members": approvals,
+        "ell": ell,
+    }
+
+
+def _lc_groups_analysis(profile, inducing_sets, comm_size, group_closures):
+    """Analysis of the large inducing sets given as in large_inducing_sets;
+    group_closures maps the packed rows of the groups to their
+    _group_closure, shared across committee sizes"""
     return_dict = {
         "maximal_lc_groups": dict(),
+        "closed_lc_groups": [],
         "usable_cands_per_g_size": dict(),
         "max_ell_in_lc_groups": 0,
     }
-    cands_as_numbers = [c.ordinal_number for c in election.candidates]
-    current_max_ell = 0
-    candidate_support_map = election.get_candidate_support_map()
-    votes = election.votes
-    for group_size in range(1, comm_size + 1):
-        current_usable_cands = set()
-        l_thres = get_largeness_threshold(group_size, len(votes), comm_size)
-        # logger.info(f"Testing group size: {group_size} w. thr: {l_thres}")
-        for group_inducing_cands in itertools.combinations(
-            cands_as_numbers, group_size
-        ):
-            cands_supporters = map(
-                lambda x: candidate_support_map[x], group_inducing_cands
-            )
-            supporting_voters = reduce(lambda a, b: a & b, cands_supporters)
-            if len(supporting_voters) >= l_thres:
-                return_dict["max_ell_in_lc_groups"] = group_size
-                all_group_members_approvals = get_group_approvals(
-                    supporting_voters, votes
-                )
-                maximal_lc_group = {
-                    "voters": supporting_voters,
-                    "inducing_cands": group_inducing_cands,
-                    "approved_by_all_group_members": all_group_members_approvals,
-                    "ell": group_size,
-                }
-                return_dict["maximal_lc_groups"].setdefault(group_size, []).append(
-                    maximal_lc_group
-                )
-                current_usable_cands |= all_group_members_approvals
+    closed_lc_groups = {}
+    level_groups = set()
+    for group_inducing_cands, supporters_bits in inducing_sets:
+        group_size = len(group_inducing_cands)
         if return_dict["max_ell_in_lc_groups"] < group_size:
-            break
-        return_dict["usable_cands_per_g_size"][group_size] = current_usable_cands
+            return_dict["max_ell_in_lc_groups"] = group_size
+            level_groups = set()
+        group_key = supporters_bits.tobytes()
+        if group_key in level_groups:
+            continue
+        level_groups.add(group_key)
+        if group_key not in closed_lc_groups:
+            if group_key not in group_closures:
+                group_closures[group_key] = _group_closure(profile, supporters_bits)
+            closed_lc_groups[group_key] = _closed_lc_group(
+                profile, group_closures[group_key], comm_size
+            )
+        closed_lc_group = closed_lc_groups[group_key]
+        maximal_lc_group = {
+            "voters": closed_lc_group["voters"],
+            "inducing_cands": group_inducing_cands,
+            "approved_by_all_group_members": closed_lc_group[
+                "approved_by_all_group_members"
+            ],
+            "ell": group_size,
+        }
+        return_dict["maximal_lc_groups"].setdefault(group_size, []).append(
+            maximal_lc_group
+        )
+        return_dict["usable_cands_per_g_size"].setdefault(group_size, set()).update(
+            closed_lc_group["approved_by_all_group_members"]
+        )
+    return_dict["closed_lc_groups"] = list(closed_lc_groups.values())
     return return_dict
 
 
-def extract_all_lc_groups(maximal_lc_groups, comm_size, votes, min_ell, max_ell=None):
-    votes_count = len(votes)
-    all_groups = []
-    for ell, groups in maximal_lc_groups.items():
+def large_cohesive_groups_analysis(election, comm_size):
+    """election can be an ApprovalElection or an ApprovalProfile. Groups are
+    only induced by the candidates left by the dominance presolve (see
+    presolve.undominated_candidates); any other inducing set can swap its
+    dominated candidates for dominating ones, which only extends the group, so
+    the largest ell and the usable candidates do not change.
+
+    Many inducing sets share their supporters, so every distinct group is
+    stored once in "closed_lc_groups" (see _closed_lc_group) and, for each
+    ell, "maximal_lc_groups" lists the distinct groups induced by ell-sets,
+    each with the (lexicographically) first of them"""
+    profile = as_profile(election)
+    cands_as_numbers = sorted(presolve.undominated_candidates(profile, comm_size))
+    return _lc_groups_analysis(
+        profile,
+        large_inducing_sets(profile, cands_as_numbers, comm_size),
+        comm_size,
+        {},
+    )
+
+
+def large_cohesive_groups_analyses(election, comm_sizes):
+    """large_cohesive_groups_analysis for each of the committee sizes, as a
+    dictionary keyed by them. The supporters of candidate subsets do not
+    depend on the committee size, only the largeness thresholds do, and they
+    decrease as it grows; so the large inducing sets are mined once, for the
+    largest size over the candidates undominated for any of the sizes, and
+    each size keeps the sets within its own undominated candidates that are
+    large for it (as the Apriori search for it would find). The groups'
+    closures are shared across the sizes"""
+    profile = as_profile(election)
+    undominated = {
+        comm_size: presolve.undominated_candidates(profile, comm_size)
+        for comm_size in comm_sizes
+    }
+    if not undominated:
+        return {}
+    mined_cands = sorted(set().union(*undominated.values()))
+    inducing_sets = list(large_inducing_sets(profile, mined_cands, max(undominated)))
+    supports = [
+        profile.count_bits(supporters_bits) for _, supporters_bits in inducing_sets
+    ]
+    group_closures = {}
+    analyses = {}
+    for comm_size, cands in undominated.items():
+        comm_size_sets = (
+            inducing_set
+            for inducing_set, support in zip(inducing_sets, supports)
+            if len(inducing_set[0]) <= comm_size
+            and support
+            >= get_largeness_threshold(
+                len(inducing_set[0]), profile.voters_count, comm_size
+            )
+            and cands.issuperset(inducing_set[0])
+        )
+        analyses[comm_size] = _lc_groups_analysis(
+            profile, comm_size_sets, comm_size, group_closures
+        )
+    return analyses
+
+
+def _levels_in_range(maximal_lc_groups, min_ell, max_ell):
+    for ell, groups in sorted(maximal_lc_groups.items()):
         if ell < min_ell:
             continue
         if max_ell and ell > max_ell:
             continue
-        l_thres = get_largeness_threshold(ell, votes_count, comm_size)
-        for group in groups:
-            for new_group_voters in itertools.combinations(group["voters"], l_thres):
-                new_lc_group = {
+        yield ell, groups
+
+
+def _earlier_overlaps(groups, index, l_thres):
+    """The intersections of the voters of groups[index] with those of the
+    earlier groups that still hold l_thres voters, keeping only the maximal
+    ones; an l_thres-subset of groups[index] was already produced by an
+    earlier group exactly if it lies in one of them"""
+    voters = groups[index]["voters"]
+    overlaps = {frozenset(voters & earlier["voters"]) for earlier in groups[:index]}
+    overlaps = [overlap for overlap in overlaps if len(overlap) >= l_thres]
+    return [
+        overlap
+        for overlap in overlaps
+        if not any(overlap < other for other in overlaps)
+    ]
+
+
+def _distinct_subsets_count(voter_sets, l_thres, limit=None):
+    """Number of the distinct l_thres-subsets of the given voter sets. Each of
+    them lies in a smallest member of the family of (at least l_thres large)
+    intersections of the sets, so, going through the family by size, every
+    member X adds comb(|X|, l_thres) less the subsets already added by the
+    members within X. Stops as soon as the count exceeds limit (if given),
+    returning the count so far"""
+    voter_sets = {frozenset(voters) for voters in voter_sets}
+    voter_sets = [voters for voters in voter_sets if len(voters) >= l_thres]
+    family = set(voter_sets)
+    frontier = family
+    while frontier:
+        new_members = set()
+        for member in frontier:
+            for voters in voter_sets:
+                intersection = member & voters
+                if len(intersection) >= l_thres and intersection not in family:
+                    new_members.add(intersection)
+        family |= new_members
+        frontier = new_members
+    subsets_count = 0
+    added_subsets = {}
+    for member in sorted(family, key=len):
+        added_subsets[member] = math.comb(len(member), l_thres) - sum(
+            added for smaller, added in added_subsets.items() if smaller < member
+        )
+        subsets_count += added_subsets[member]
+        if limit is not None and subsets_count > limit:
+            break
+    return subsets_count
+
+
+def extract_all_lc_groups(maximal_lc_groups, comm_size, votes, min_ell, max_ell=None):
+    """Lazily yields every ell-large ell-cohesive group of exactly
+    get_largeness_threshold(ell) voters (min_ell <= ell <= max_ell), i.e.,
+    each such subset of the voters of the groups in maximal_lc_groups (see
+    large_cohesive_groups_analysis); votes is the ApprovalProfile (or
+    election). The voters are given as a sorted tuple of voter indices, and
+    a subset shared by overlapping groups of a level is yielded only once,
+    by the first of them"""
+    profile = as_profile(votes)
+    for ell, groups in _levels_in_range(maximal_lc_groups, min_ell, max_ell):
+        l_thres = get_largeness_threshold(ell, profile.voters_count, comm_size)
+        for index, group in enumerate(groups):
+            overlaps = _earlier_overlaps(groups, index, l_thres)
+            for new_group_voters in itertools.combinations(
+                sorted(group["voters"]), l_thres
+            ):
+                if any(overlap.issuperset(new_group_voters) for overlap in overlaps):
+                    continue
+                approvals = np.bitwise_or.reduce(
+                    profile.voter_bits[list(new_group_voters)], axis=0
+                )
+                yield {
                     "voters": new_group_voters,
                     "inducing_cands": group["inducing_cands"],
-                    "approved_by_all_group_members": get_group_approvals(
-                        new_group_voters, votes
+                    "approved_by_all_group_members": set(
+                        np.flatnonzero(
+                            np.unpackbits(approvals, count=profile.candidates_count)
+                        ).tolist()
                     ),
                     "ell": ell,
                 }
-                all_groups.append(new_lc_group)
-    return all_groups
+
+
+def count_all_lc_groups(
+    maximal_lc_groups, comm_size, votes_count, min_ell, max_ell=None, limit=None
+):
+    """Number of the groups extract_all_lc_groups yields, counted without
+    enumerating them. With limit, the counting stops as soon as the number
+    exceeds it; the result is then only known to be greater than limit"""
+    all_groups_count = 0
+    for ell, groups in _levels_in_range(maximal_lc_groups, min_ell, max_ell):
+        l_thres = get_largeness_threshold(ell, votes_count, comm_size)
+        all_groups_count += _distinct_subsets_count(
+            (group["voters"] for group in groups),
+            l_thres,
+            None if limit is None else limit - all_groups_count,
+        )
+        if limit is not None and all_groups_count > limit:
+            break
+    return all_groups_count
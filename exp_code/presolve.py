@@ -0,0 +1,81 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Copyright 2025 Andrzej Kaczmarczyk<droodev@gmail.com>
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the “Software”), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+import numpy as np
+
+import core.mylog as mylog
+from elections import as_profile
+
+logger = mylog.get_logger()
+
+# bound on the number of bytes of the candidate pairs' supporters materialized
+# at once by dominance_matrix
+DOMINANCE_CHUNK_BYTES = 2**26
+
+
+def dominance_matrix(V, candidates=None):
+    """Boolean matrix D over the given candidates (all by default, in the
+    given order) with D[a, b] set iff a != b and every supporter of the a-th
+    candidate supports the b-th one. All pairs are compared at once on the
+    packed supporter rows"""
+    profile = as_profile(V)
+    if candidates is None:
+        candidates = range(profile.candidates_count)
+    bits = profile.candidate_bits[list(candidates)]
+    not_bits = ~bits
+    dominated = np.empty((len(bits), len(bits)), dtype=bool)
+    chunk = max(1, DOMINANCE_CHUNK_BYTES // max(1, bits.size))
+    for start in range(0, len(bits), chunk):
+        rows = bits[start : start + chunk, np.newaxis, :]
+        dominated[start : start + chunk] = ~(rows & not_bits).any(axis=2)
+    np.fill_diagonal(dominated, False)
+    return dominated
+
+
+def undominated_candidates(V, committee_size, candidates=None):
+    """Drops candidates whose supporters are included in the supporters of at
+    least committee_size other remaining candidates (those with the fewest
+    supporters are considered first, clones with the highest ids before those
+    with lower ones). Any committee, justifying group or set of witnessing
+    candidates of at most committee_size members can swap a dropped candidate
+    for one of its dominators outside it, which keeps JR, PJR, EJR and the
+    cohesiveness of groups. Returns the set of the remaining candidates"""
+    profile = as_profile(V)
+    if candidates is None:
+        candidates = range(profile.candidates_count)
+    candidates = sorted(candidates)
+    dominated = dominance_matrix(profile, candidates)
+    support = profile.support_counts[candidates]
+    remaining = np.ones(len(candidates), dtype=bool)
+    for index in sorted(
+        range(len(candidates)), key=lambda index: (support[index], -index)
+    ):
+        if np.count_nonzero(dominated[index] & remaining) >= committee_size:
+            remaining[index] = False
+    kept = [cand for cand, keep in zip(candidates, remaining) if keep]
+    if candidates:
+        logger.debug(
+            f"Dominance presolve: {len(kept)} of {len(candidates)} candidates kept"
+            f"; Ratio: {int(len(kept) / len(candidates) * 100)}%"
+        )
+    return set(kept)
@@ -21,27 +21,48 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
-from core.baseProgram import compute, COVERAGE_MAX, APPROVAL_MAX, compute_pav
+from core.baseProgram import (
+    compute,
+    COVERAGE_MAX,
+    APPROVAL_MAX,
+    compute_compact_pav,
+)
 from core.baseProgram import (
     COMPUTE_PJR,
     COMPUTE_EJR,
     computeEJRorPJR,
     computePJR,
     computeEJR,
+    BoundedCommitteeModel,
+    make_xjr_verifier,
 )
 from gmpy2 import mpq
-from elections import ApprovalElection
+import numpy as np
+from elections import ApprovalElection, as_profile, as_approval_sets
 from candidates import Candidates, Candidate
 import sys
 import tools.tools as tools
 import core.mylog as mylog
 
 logger = mylog.get_logger()
-import lcgroups
+import lccache
 from functools import reduce
 
 
+def _reusable_model(model, candidates, voters, committee_size, **model_args):
+    """Returns model if it was built for the arguments, a new
+    BoundedCommitteeModel otherwise"""
+    if model is not None and model.is_for(
+        candidates, voters, committee_size, **model_args
+    ):
+        return model
+    return BoundedCommitteeModel(candidates, voters, committee_size, **model_args)
+
+
 class JRCommittee(object):
+    def __init__(self):
+        self.bounded_model = None
+
     def compute(self, candidates, voters, mesh, stats, existenceSymbol):
         committeeSize = mesh.committeeSize
         mesh.clipMeshByValues(
@@ -59,19 +80,19 @@ class JRCommittee(object):
     def compute_once(
         self, candidates, voters, committee_size, min_cov, max_cov, min_app, max_app
     ):
-        return compute(
-            candidates, voters, min_app, max_app, min_cov, max_cov, committee_size
+        self.bounded_model = _reusable_model(
+            self.bounded_model, candidates, voters, committee_size
         )
+        return self.bounded_model.solve(min_app, max_app, min_cov, max_cov)
 
     def description(self):
         return "JR Committee"
 
 
 def _compute_relevant_cands(committee_size, candidates, voters):
-    cands = Candidates([Candidate(c) for c in candidates])
-    election = ApprovalElection(voters, cands)
+    profile = as_profile(voters, len(candidates))
     logger.debug(f"Starting LC group analysis")
-    lc_groups_data = lcgroups.large_cohesive_groups_analysis(election, committee_size)
+    lc_groups_data = lccache.large_cohesive_groups_analysis(profile, committee_size)
     max_lc_group_size = lc_groups_data["max_ell_in_lc_groups"]
     usable_cands_per_g_size = lc_groups_data["usable_cands_per_g_size"]
     maximal_lc_groups = lc_groups_data["maximal_lc_groups"]
@@ -92,6 +113,8 @@ class PJRCommittee(object):
 
     def __init__(self):
         self.relevant_cands = None
+        self.bounded_model = None
+        self.xjr_verifier = None
 
     def compute(self, candidates, voters, mesh, stats, existenceSymbol):
         committeeSize = mesh.committeeSize
@@ -115,6 +138,12 @@ class PJRCommittee(object):
             self.relevant_cands = _compute_relevant_cands(
                 committee_size, candidates, voters
             )
+        model = _reusable_model(self.bounded_model, candidates, voters, committee_size)
+        if model is not self.bounded_model:
+            self.bounded_model = model
+            self.xjr_verifier = make_xjr_verifier(
+                candidates, voters, committee_size, COMPUTE_PJR, self.relevant_cands
+            )
         return computePJR(
             candidates,
             voters,
@@ -124,6 +153,8 @@ class PJRCommittee(object):
             max_cov,
             committee_size,
             self.relevant_cands,
+            self.bounded_model,
+            self.xjr_verifier,
         )
 
     def description(self):
@@ -133,6 +164,8 @@ class PJRCommittee(object):
 class EJRCommittee(object):
     def __init__(self):
         self.relevant_cands = None
+        self.bounded_model = None
+        self.xjr_verifier = None
 
     def compute(self, candidates, voters, mesh, stats, existenceSymbol):
         committeeSize = mesh.committeeSize
@@ -156,6 +189,12 @@ class EJRCommittee(object):
             self.relevant_cands = _compute_relevant_cands(
                 committee_size, candidates, voters
             )
+        model = _reusable_model(self.bounded_model, candidates, voters, committee_size)
+        if model is not self.bounded_model:
+            self.bounded_model = model
+            self.xjr_verifier = make_xjr_verifier(
+                candidates, voters, committee_size, COMPUTE_EJR, self.relevant_cands
+            )
         return computeEJR(
             candidates,
             voters,
@@ -165,6 +204,8 @@ class EJRCommittee(object):
             max_cov,
             committee_size,
             self.relevant_cands,
+            self.bounded_model,
+            self.xjr_verifier,
         )
 
     def description(self):
@@ -172,6 +213,9 @@ class EJRCommittee(object):
 
 
 class AnyCommittee(object):
+    def __init__(self):
+        self.bounded_model = None
+
     def compute(self, candidates, voters, mesh, stats, existenceSymbol):
         committeeSize = mesh.committeeSize
         mesh.clipMeshByValues(stats.minCov, stats.maxCov, stats.minApp, stats.maxApp)
@@ -197,17 +241,15 @@ class AnyCommittee(object):
     def compute_once(
         self, candidates, voters, committee_size, min_cov, max_cov, min_app, max_app
     ):
-        return compute(
+        self.bounded_model = _reusable_model(
+            self.bounded_model,
             candidates,
             voters,
-            min_app,
-            max_app,
-            min_cov,
-            max_cov,
             committee_size,
             goal=APPROVAL_MAX,
             requireJR=False,
         )
+        return self.bounded_model.solve(min_app, max_app, min_cov, max_cov)
 
     def description(self):
         return "Any Committee"
@@ -259,6 +301,47 @@ class ChamberlinCourantCommittee(object):
         return "Chamberlin-Courant Committee"
 
 
+def _pav_gains(profile, represented):
+    """PAV score gain of adding each candidate to a committee giving
+    represented[v] representatives to voter v"""
+    return profile.matrix.T @ (1.0 / (represented + 1))
+
+
+def sequential_pav_with_swaps(profile, committee_size, max_swaps=None):
+    """Sequential PAV committee improved by swaps of a member for a
+    non-member, each the best one for the removed member, while they increase
+    the PAV score (at most max_swaps of them, committee_size times the number
+    of candidates by default)"""
+    if max_swaps is None:
+        max_swaps = committee_size * profile.candidates_count
+    represented = np.zeros(profile.voters_count)
+    committee = []
+    for _ in range(committee_size):
+        gains = _pav_gains(profile, represented)
+        gains[committee] = -np.inf
+        cand = int(np.argmax(gains))
+        committee.append(cand)
+        represented += profile.matrix[:, cand]
+    for _ in range(max_swaps):
+        best = (1e-9, None, None)
+        for index, member in enumerate(committee):
+            supporters = profile.matrix[:, member]
+            loss = (1.0 / represented[supporters]).sum()
+            without = represented - supporters
+            gains = _pav_gains(profile, without)
+            gains[committee] = -np.inf
+            cand = int(np.argmax(gains))
+            if gains[cand] - loss > best[0]:
+                best = (gains[cand] - loss, index, cand)
+        _, index, cand = best
+        if index is None:
+            break
+        represented += profile.matrix[:, cand]
+        represented -= profile.matrix[:, committee[index]]
+        committee[index] = cand
+    return committee
+
+
 class SinglePAV(object):
 
     def __init__(self):
@@ -267,8 +350,18 @@ class SinglePAV(object):
     def compute(
         self, candidates, voters, min_app, max_app, min_cov, max_cov, comm_size
     ):
-        success, satisfaction, _, coverage, approval = compute_pav(
-            candidates, voters, min_app, max_app, min_cov, max_cov, comm_size
+        start = sequential_pav_with_swaps(
+            as_profile(voters, len(candidates)), comm_size
+        )
+        success, satisfaction, _, coverage, approval = compute_compact_pav(
+            candidates,
+            voters,
+            min_app,
+            max_app,
+            min_cov,
+            max_cov,
+            comm_size,
+            start=start,
         )
         return success, satisfaction, coverage, approval
 
@@ -315,11 +408,7 @@ class SingleSequentialPhragmen(object):
     def compute_once(
         self, candidates, voters, committee_size, min_cov, max_cov, min_app, max_app
     ):
-        if isinstance(voters, list):
-            voters = dict(
-                (index_voter[0], index_voter[1].approvals)
-                for index_voter in enumerate(voters)
-            )
+        voters = as_approval_sets(voters)
         # We actually really want to compute it once!
         if not self.computed_data:
             self.computed_data = self.compute(candidates, voters, committee_size)
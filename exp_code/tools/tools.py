@@ -316,7 +316,7 @@ class Mesh2(object):
                     logger.info(
                         f"Areas:{computed_areas} Tot "
                         f"time: {round(cumulative_time,2)}s Avg time:"
-                        f"{round(cumulative_time/computed_areas,2)}"
+                        f"{round(cumulative_time/computed_areas,4)}s"
                     )
                 area = self._adaptation_driver.get_next_area()
                 min_cov_index, max_cov_index, min_app_index, max_app_index = area
@@ -35,6 +35,8 @@ import operator
 import tqdm
 
 import isxJRChecker as xJRTools
+import core.backends as backends
+import core.cfg as cfg
 import distribs
 import discore
 import tools.pblib as pbtools
@@ -86,6 +88,21 @@ def get_argument_parser():
     ap.add_argument(
         "-d", "--distribution", required=True, choices=EXPERIMENTS_DISTROS.keys()
     )
+    ap.add_argument(
+        "-ps",
+        "--plus_screening",
+        action="store_true",
+        required=False,
+        help="Accept EJR/PJR committees satisfying EJR+/PJR+ without the ILPs",
+    )
+    ap.add_argument(
+        "-mb",
+        "--milp_backend",
+        required=False,
+        default=cfg.milp_backend,
+        choices=backends.BACKENDS,
+        help="MILP backend solving the xJR verification models",
+    )
     return ap
 
 
@@ -215,6 +232,7 @@ EXPERIMENTS_DISTROS = {
 
 if __name__ == "__main__":
     args = get_argument_parser().parse_args()
+    cfg.milp_backend = args.milp_backend
     trials = int(args.trialsCount)
     k = int(args.committeeSize)
     n = int(args.voters_count)
@@ -245,20 +263,15 @@ if __name__ == "__main__":
             else:
                 app_election = distro.generate(list(range(m)), n)
             # print(app_election)
-            binary_profile = app_election.get_binary_representation()
-            app += reduce(
-                operator.add,
-                [
-                    reduce(operator.add, binary_pref, 0)
-                    for binary_pref in binary_profile
-                ],
-                0,
-            )
+            profile = app_election.profile
+            app += profile.approvals_count
 
             W = sample(app_election.candidates, k)
             W = [cand.ordinal_number for cand in W]
 
-            JRFlag, PJRFlag, EJRFlag = xJRTools.xJRChecking(binary_profile, W)
+            JRFlag, PJRFlag, EJRFlag = xJRTools.xJRChecking(
+                profile, W, args.plus_screening
+            )
 
             ejr = ejr + int(EJRFlag)
             pjr = pjr + int(PJRFlag)
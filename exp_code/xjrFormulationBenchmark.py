@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Copyright 2025 Andrzej Kaczmarczyk<droodev@gmail.com>
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the “Software”), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""Compares the pairwise and the aggregated cohesiveness formulations of the
+single (all ell) EJR/PJR verification ILPs on random committees of sampled
+elections: model sizes, building and solving times, and the verdicts (which
+have to agree)"""
+
+from random import seed, sample
+import sys
+import time
+import argparse
+
+import isxJRChecker as xJRTools
+import distribs
+import discore
+import core.backends as backends
+import core.cfg as cfg
+
+seed(123)
+
+FORMULATIONS = (xJRTools.PAIRWISE_FORMULATION, xJRTools.AGGREGATED_FORMULATION)
+
+ILP_BUILDERS = {
+    xJRTools.EJR: (xJRTools.ejr_all_ells_ilp, 1),
+    xJRTools.PJR: (xJRTools.pjr_all_ells_ilp, 2),
+}
+
+DISTROS = {
+    "1D": distribs.OneDDistribution(
+        discore.DistributionParameters(approval_radius=0.1)
+    ),
+    "2D": distribs.TwoDDistribution(
+        discore.DistributionParameters(approval_radius=0.2)
+    ),
+    "IC": distribs.ImpartialCulture(
+        discore.DistributionParameters(approval_probability=0.2)
+    ),
+}
+
+
+def get_argument_parser():
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "-k", "--committeeSize", required=True, help="Size of the committee to draw"
+    )
+    ap.add_argument(
+        "-t",
+        "--trialsCount",
+        required=False,
+        default=10,
+        help="Number of elections (each with a random committee) to check",
+    )
+    ap.add_argument("-n", "--voters_count", required=True, help="Number of voters")
+    ap.add_argument(
+        "-m", "--candidates_count", required=True, help="Number of candidates"
+    )
+    ap.add_argument(
+        "-a",
+        "--axiom",
+        required=False,
+        default=xJRTools.EJR,
+        choices=ILP_BUILDERS.keys(),
+    )
+    ap.add_argument(
+        "-d", "--distribution", required=False, default="1D", choices=DISTROS.keys()
+    )
+    ap.add_argument(
+        "-mb",
+        "--milp_backend",
+        required=False,
+        default=cfg.milp_backend,
+        choices=backends.BACKENDS,
+        help="MILP backend solving the xJR verification models",
+    )
+    return ap
+
+
+def benchmark_formulation(profile, W, k, axiom, formulation):
+    """Returns (constraints count, variables count, build time, solve time,
+    verdict) of the single ILP in the given formulation"""
+    builder, first_ell = ILP_BUILDERS[axiom]
+    start = time.perf_counter()
+    model, X, Y, Z = builder(
+        profile, W, range(first_ell, k + 1), k, formulation=formulation
+    )
+    built = time.perf_counter()
+    model.solve(backends.get_solver())
+    solved = time.perf_counter()
+    verdict = xJRTools._unhappy_group_of_solved(model, X) is None
+    return (
+        len(model.constraints),
+        len(model.variables()),
+        built - start,
+        solved - built,
+        verdict,
+    )
+
+
+if __name__ == "__main__":
+    args = get_argument_parser().parse_args()
+    cfg.milp_backend = args.milp_backend
+    trials = int(args.trialsCount)
+    k = int(args.committeeSize)
+    n = int(args.voters_count)
+    m = int(args.candidates_count)
+
+    totals = {formulation: [0, 0, 0.0, 0.0] for formulation in FORMULATIONS}
+    disagreements = 0
+    for trial in range(trials):
+        profile = DISTROS[args.distribution].generate(range(m), n).profile
+        W = sample(range(m), k)
+        verdicts = set()
+        for formulation in FORMULATIONS:
+            *measures, verdict = benchmark_formulation(
+                profile, W, k, args.axiom, formulation
+            )
+            verdicts.add(verdict)
+            for i, measure in enumerate(measures):
+                totals[formulation][i] += measure
+        disagreements += len(verdicts) > 1
+
+    for formulation in FORMULATIONS:
+        constraints, variables, build_time, solve_time = totals[formulation]
+        print(
+            f"{formulation:>10}: constraints: {constraints / trials:.1f}  "
+            f"variables: {variables / trials:.1f}  build: {build_time / trials:.4f}s  "
+            f"solve: {solve_time / trials:.4f}s"
+        )
+    if disagreements:
+        print(f"Formulations disagreed on {disagreements} trials", file=sys.stderr)
+        sys.exit(1)